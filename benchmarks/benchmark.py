@@ -0,0 +1,169 @@
+"""
+Benchmarks of the background estimation algorithms on synthetic spectra.
+
+Every spectrum is a known smooth background (a decaying exponential plus a constant) with Gaussian peaks at random positions, scaled to the requested number of counts and sampled with Poisson noise, so the accuracy of each estimated background can be measured against the true one. The batched functions (batchSasnip and calculate_batch_snip_background) are also timed on batches of spectra of each kind against a loop of the single-spectrum functions over the same spectra. For each algorithm, parameter set and spectrum the wall time (best and median of the repetitions), the peak memory allocated (tracemalloc) and the number of iterations are recorded and written to JSON and CSV files. A previous JSON file can be given with --compare to print the time ratios of the cases present in both runs.
+
+Run python benchmarks/benchmark.py -h for the options.
+"""
+import argparse
+import csv
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from nda import sasnip
+from nda.background import calculate_batch_snip_background, calculate_snip_background
+from nda.diagnostics import backgroundDiagnostics
+
+sizes = [1024, 4096, 16384, 65536]
+densities = [2, 8]
+counts = [1e2, 1e4]
+
+sasnipParameters = [
+    {"peakMaximum": 100, "derivativeThreshold": 1, "decrease": True, "smooth": True},
+    {"peakMaximum": 50, "derivativeThreshold": 0, "decrease": False, "smooth": False},
+]
+snipParameters = [
+    {"mhw": 10, "shw": 1, "decrease": True, "lls": True},
+    {"mhw": 30, "shw": 0, "decrease": False, "lls": True},
+]
+
+def synthetic_spectrum(size, density, level, seed = 0):
+    """
+    Returns (spectrum, true background, peak centroids) with `density` peaks per 1000 channels, about `level` background counts per channel at the start of the spectrum and peak FWHMs between 4 and 20 channels.
+    """
+    rng = np.random.default_rng(seed)
+    x = np.arange(size)
+    background = level * (0.9 * np.exp(-3 * x / size) + 0.1)
+    expected = background.copy()
+    centroids = np.sort(rng.uniform(0.02 * size, 0.98 * size, max(1, int(density * size / 1000))))
+    for centroid in centroids:
+        fwhm = rng.uniform(4, 20)
+        amplitude = rng.uniform(0.5, 10) * level
+        expected += amplitude * np.exp(-4 * np.log(2) * ((x - centroid) / fwhm) ** 2)
+    return rng.poisson(expected).astype(float), background, centroids
+
+def accuracy(estimated, background):
+    residual = estimated - background
+    return {"rmse": float(np.sqrt(np.mean(residual ** 2))), "meanRelativeError": float(np.mean(np.abs(residual) / background)), "maxRelativeError": float(np.max(np.abs(residual) / background))}
+
+def sasnip_iterations(spectrum, parameters):
+    diagnostics = backgroundDiagnostics()
+    background = sasnip.sasnip(spectrum, diagnostics = diagnostics, **parameters)
+    return background, int(diagnostics.iterations[0])
+
+def measure(function, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, {"bestTime": min(times), "medianTime": statistics.median(times), "peakMemory": peak}
+
+def cases(spectrum):
+    yield "smoothSignal", {}, lambda: sasnip.smoothSignal(spectrum), None
+    yield "findPeaks", {}, lambda: sasnip.findPeaks(spectrum), None
+    for parameters in sasnipParameters:
+        yield "sasnip", parameters, lambda: sasnip_iterations(spectrum, parameters), "sasnip"
+    for parameters in snipParameters:
+        iterations = min(parameters["mhw"], (spectrum.size - 1) // 2)
+        yield "snip", parameters, lambda: (calculate_snip_background(spectrum, **parameters)[1], iterations), "snip"
+
+def batch_cases(spectra):
+    #Each batched function is followed by the loop it replaces
+    for parameters in sasnipParameters:
+        yield "batchSasnip", parameters, lambda: sasnip.batchSasnip(spectra, **parameters)
+        yield "sasnipLoop", parameters, lambda: [sasnip.sasnip(spectrum, **parameters) for spectrum in spectra]
+    for parameters in snipParameters:
+        yield "batchSnip", parameters, lambda: calculate_batch_snip_background(spectra, **parameters)
+        yield "snipLoop", parameters, lambda: [calculate_snip_background(spectrum, **parameters) for spectrum in spectra]
+
+def run_batches(size, density, level, batch, repeat, seed):
+    spectra = np.array([synthetic_spectrum(size, density, level, seed + number)[0] for number in range(batch)])
+    results = []
+    for name, parameters, function in batch_cases(spectra):
+        record = measure(function, repeat)[1]
+        record.update({"algorithm": name, "parameters": parameters, "channels": size, "peakDensity": density, "counts": level, "spectra": batch})
+        if name.endswith("Loop"):
+            record["speedup"] = record["bestTime"] / results[-1]["bestTime"]
+            results[-1]["speedup"] = record["speedup"]
+        results.append(record)
+        print("%-12s %6d ch %2d pk/kch %8.0f cts %s: %.4f s for %d spectra%s" % (name, size, density, level, json.dumps(parameters, sort_keys = True), record["bestTime"], batch, ", batch speedup %.2f" % record["speedup"] if "speedup" in record else ""), file = sys.stderr)
+    return results
+
+def run(sizes, densities, counts, repeat, seed, batch = 0):
+    results = []
+    for size in sizes:
+        for density in densities:
+            for level in counts:
+                spectrum, background, centroids = synthetic_spectrum(size, density, level, seed)
+                for name, parameters, function, kind in cases(spectrum):
+                    result, record = measure(function, repeat)
+                    record.update({"algorithm": name, "parameters": parameters, "channels": size, "peakDensity": density, "counts": level, "peaks": len(centroids)})
+                    if kind is None:
+                        if name == "findPeaks":
+                            record["peakChannels"] = int(np.count_nonzero(result))
+                    else:
+                        estimated, record["iterations"] = result
+                        record.update(accuracy(estimated, background))
+                    results.append(record)
+                    print("%-12s %6d ch %2d pk/kch %8.0f cts %s: %.4f s" % (name, size, density, level, json.dumps(parameters, sort_keys = True), record["bestTime"]), file = sys.stderr)
+                if batch > 0:
+                    results += run_batches(size, density, level, batch, repeat, seed)
+    return results
+
+def case_key(record):
+    return (record["algorithm"], json.dumps(record["parameters"], sort_keys = True), record["channels"], record["peakDensity"], record["counts"])
+
+def compare(results, previousFile):
+    with open(previousFile) as previous:
+        before = {case_key(record): record for record in json.load(previous)["results"]}
+    print("%-12s %-70s %8s %8s %8s" % ("algorithm", "case", "before", "now", "ratio"))
+    for record in results:
+        key = case_key(record)
+        if key in before:
+            ratio = record["bestTime"] / before[key]["bestTime"]
+            print("%-12s %-70s %8.4f %8.4f %8.2f" % (key[0], "%s %d ch %d pk/kch %g cts" % key[1:], before[key]["bestTime"], record["bestTime"], ratio))
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = "Benchmark the background estimation algorithms on synthetic spectra.")
+    parser.add_argument("-o", "--output", default = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results"), help = "directory of the result files")
+    parser.add_argument("--sizes", type = int, nargs = "+", default = sizes, help = "numbers of channels")
+    parser.add_argument("--densities", type = float, nargs = "+", default = densities, help = "peaks per 1000 channels")
+    parser.add_argument("--counts", type = float, nargs = "+", default = counts, help = "background counts per channel")
+    parser.add_argument("--repeat", type = int, default = 3, help = "timed repetitions of each case")
+    parser.add_argument("--seed", type = int, default = 0)
+    parser.add_argument("--batch", type = int, default = 32, help = "spectra of the batched cases (0 to skip them)")
+    parser.add_argument("--quick", action = "store_true", help = "only the two smallest sizes and one repetition")
+    parser.add_argument("--compare", help = "JSON file of a previous run")
+    args = parser.parse_args(argv)
+    if args.quick:
+        args.sizes, args.repeat = sorted(args.sizes)[:2], 1
+
+    results = run(args.sizes, args.densities, args.counts, args.repeat, args.seed, args.batch)
+    os.makedirs(args.output, exist_ok = True)
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    metadata = {"date": stamp, "python": platform.python_version(), "numpy": np.__version__, "machine": platform.machine(), "processor": platform.processor(), "seed": args.seed, "repeat": args.repeat}
+    with open(os.path.join(args.output, "benchmark-%s.json" % stamp), "w") as jsonFile:
+        json.dump({"metadata": metadata, "results": results}, jsonFile, indent = 1)
+    fields = ["algorithm", "parameters", "channels", "peakDensity", "counts", "peaks", "bestTime", "medianTime", "peakMemory", "spectra", "speedup", "iterations", "peakChannels", "rmse", "meanRelativeError", "maxRelativeError"]
+    with open(os.path.join(args.output, "benchmark-%s.csv" % stamp), "w", newline = "") as csvFile:
+        writer = csv.DictWriter(csvFile, fields)
+        writer.writeheader()
+        for record in results:
+            writer.writerow(dict(record, parameters = json.dumps(record["parameters"], sort_keys = True)))
+    if args.compare:
+        compare(results, args.compare)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""
+Import time of the modules of the nda package.
+
+Each module is imported in a new interpreter, as a worker process or a batch script would do, several times, and the median time is compared with a fixed budget. The optional dependencies that only some functions need (pybaselines and scipy for SNIP) and the GUI libraries must not be imported. The exit status is 1 if a module goes over the budget or imports one of them.
+
+Run python benchmarks/import_time.py -h for the options.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+modules = ["nda." + name for name in ["sasnip", "background", "loader", "roi", "cache", "store", "live", "decimation", "diagnostics", "sweep", "batch", "matrix"]]
+heavy = ["scipy", "pybaselines", "matplotlib", "PyQt5"]
+budget = 0.5
+
+script = """
+import sys, time
+start = time.perf_counter()
+import %s
+print(time.perf_counter() - start)
+print(" ".join(name for name in %r if name in sys.modules))
+"""
+
+def import_time(module):
+    output = subprocess.run([sys.executable, "-c", script % (module, heavy)], cwd = root, capture_output = True, text = True, check = True).stdout.split("\n")
+    return float(output[0]), output[1].split()
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = "Measure the import time of the modules of the nda package.")
+    parser.add_argument("--budget", type = float, default = budget, help = "maximum median import time of each module, in seconds")
+    parser.add_argument("--repeat", type = int, default = 5, help = "imports of each module")
+    parser.add_argument("modules", nargs = "*", default = modules)
+    args = parser.parse_args(argv)
+
+    failed = False
+    for module in args.modules:
+        times, imported = [], []
+        for _ in range(args.repeat):
+            seconds, imported = import_time(module)
+            times.append(seconds)
+        median = statistics.median(times)
+        over = median > args.budget
+        failed = failed or over or bool(imported)
+        print("%-16s %8.1f ms%s%s" % (module, 1000 * median, "  over budget" if over else "", "  imports " + ", ".join(imported) if imported else ""))
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,3 @@
+"""
+Numeric core of the Nuclear Data Analysis application, without GUI: the SASNIP and SNIP background estimation (sasnip, background, matrix), spectrum files and stores (loader, store), regions of interest (roi), caching (cache), batch processing (batch), live acquisition (live), parameter sweeps (sweep), diagnostics and plot decimation (decimation). The package imports nothing on its own, so a process only pays for the modules it uses; the optional dependencies (pybaselines, scipy) are imported by the functions that need them.
+"""
@@ -0,0 +1,132 @@
+import numpy as np
+from .diagnostics import timed
+from .sasnip import sasnip, batchSasnip
+
+def calculate_snip_background(data, mhw, shw, decrease = True, lls = True, fo = 2):
+    if lls == True:
+        transformed_data =  np.log(np.log(np.sqrt(data + 1) + 1) + 1)
+    else:
+        transformed_data = data
+    background = transformed_snip_background(transformed_data, mhw, shw, decrease, lls, fo)
+    data_no_bkg = data - background
+    return data_no_bkg, background
+
+def transformed_snip_background(transformed_data, mhw, shw, decrease = True, lls = True, fo = 2):
+    """
+    Returns the SNIP background of calculate_snip_background from the data already transformed with the LLS operator (or the data itself if lls is false), so that the transform can be shared by several estimations.
+    """
+    #pybaselines (and scipy) take most of the import time of this module, and only SNIP needs them
+    from pybaselines.smooth import snip
+    background = snip(transformed_data, max_half_window = mhw, decreasing = decrease, smooth_half_window = shw, filter_order = fo)[0]
+    if lls == True:
+        background = -1 + (np.exp(np.exp(background) - 1) - 1) ** 2
+    return background
+
+#Largest size in bytes of a block of padded spectra clipped together by batch_snip
+block_bytes = 1 << 19
+
+def batch_snip(data, max_half_window, decreasing = False, smooth_half_window = None, filter_order = 2):
+    """
+    This function executes the SNIP algorithm of pybaselines over several spectra with the same number of channels at once. The edges of every spectrum are padded with the pybaselines padding and the clipping windows are then applied to all the spectra with the same array operations, so each row of the result is equal to the baseline given by pybaselines.smooth.snip for that row.
+
+    Parameters
+    ----------
+    data : numpy.ndarray
+        2-D array with one spectrum per row.
+    max_half_window : int
+        The maximum clipping window. Values larger than (number of channels - 1) / 2 have no effect.
+    decreasing : bool, optional
+        If true, the windows are applied from max_half_window to 1, otherwise from 1 to max_half_window.
+    smooth_half_window : int, optional
+        If larger than 0, the half window of the moving average applied to the spectra in each clipping window.
+    filter_order : {2, 4, 6, 8}, optional
+        The order of the clipping filter.
+
+    Returns
+    -------
+    baseline : numpy.ndarray
+        2-D array with the baseline of each row of data.
+    """
+    from pybaselines.utils import pad_edges
+    from scipy.ndimage import uniform_filter1d
+    if filter_order not in {2, 4, 6, 8}:
+        raise ValueError('filter_order must be 2, 4, 6, or 8')
+    size = data.shape[1]
+    half_window = min(max_half_window, (size - 1) // 2)
+    padded_size = size + 2 * half_window
+    smooth = smooth_half_window is not None and smooth_half_window > 0
+    result = np.empty(data.shape)
+
+    if decreasing:
+        range_args = (half_window, 0, -1)
+    else:
+        range_args = (1, half_window + 1, 1)
+
+    def neighbours(i, k):
+        return baseline[:, i - k: padded_size - i - k] + baseline[:, i + k: padded_size - i + k]
+
+    #Every window makes several temporary arrays of the size of the spectra, so the rows are clipped in blocks that fit in the processor cache
+    block_rows = max(block_bytes // (8 * padded_size), 1)
+    for start in range(0, data.shape[0], block_rows):
+        baseline = np.array([pad_edges(spectrum, half_window) for spectrum in data[start: start + block_rows]], dtype = float)
+        for i in range(*range_args):
+            filters = neighbours(i, i) / 2
+            if filter_order > 2:
+                filters = np.maximum(filters, (- neighbours(i, i) + 4 * neighbours(i, i // 2)) / 6)
+            if filter_order > 4:
+                filters = np.maximum(filters, (neighbours(i, i) - 6 * neighbours(i, 2 * i // 3) + 15 * neighbours(i, i // 3)) / 20)
+            if filter_order > 6:
+                filters = np.maximum(filters, (- neighbours(i, i) + 8 * neighbours(i, 3 * i // 4) - 28 * neighbours(i, i // 2) + 56 * neighbours(i, i // 4)) / 70)
+
+            if smooth:
+                previous_baseline = uniform_filter1d(baseline, 2 * smooth_half_window + 1, axis = 1)[:, i: -i]
+            else:
+                previous_baseline = baseline[:, i: -i]
+            baseline[:, i: -i] = np.where(baseline[:, i: -i] > filters, filters, previous_baseline)
+        result[start: start + block_rows] = baseline[:, half_window: padded_size - half_window]
+
+    return result
+
+def calculate_batch_snip_background(data, mhw, shw, decrease = True, lls = True, fo = 2):
+    data = np.asarray(data)
+    if data.ndim != 2:
+        raise ValueError("data must be a 2-D array with one spectrum per row")
+    if lls == True:
+        transformed_data =  np.log(np.log(np.sqrt(data + 1) + 1) + 1)
+        background = batch_snip(transformed_data, mhw, decrease, shw, fo)
+        background = -1 + (np.exp(np.exp(background) - 1) - 1) ** 2
+    else:
+        background = batch_snip(data, mhw, decrease, shw, fo)
+    data_no_bkg = data - background
+    return data_no_bkg, background
+
+def scaled_background(previousData, previousBackground, data):
+    """
+    Returns the background of an earlier state of the spectrum scaled by the ratio of the total counts, as an approximation of the background of data until it is estimated again, or None if there is no usable earlier background.
+    """
+    if previousBackground is None or previousBackground.shape != data.shape:
+        return None
+    previousSum = previousData.sum()
+    if not previousSum > 0:
+        return None
+    return previousBackground * (data.sum() / previousSum)
+
+def estimate_background(data, method, parameters, pipeline = None, diagnostics = None):
+    """
+    Estimates the background of a spectrum with SASNIP ("sasnip", parameters are keyword arguments of sasnip.sasnip) or SNIP ("snip", parameters are keyword arguments of calculate_snip_background) and returns the spectrum without background and the background. For SASNIP, a sasnipPipeline of data can be given to reuse the stages computed in previous calls. A diagnostics.backgroundDiagnostics can be given to record the stages of the estimation (SNIP is a single stage).
+    """
+    if method == "sasnip":
+        background = sasnip(data, diagnostics = diagnostics, **parameters) if pipeline is None else pipeline.run(diagnostics = diagnostics, **parameters)
+        return data - background, background
+    with timed(diagnostics, "snip"):
+        return calculate_snip_background(data, **parameters)
+
+def estimate_batch_background(data, method, parameters, diagnostics = None):
+    """
+    Same as estimate_background for a 2-D array with one spectrum per row (batchSasnip or calculate_batch_snip_background).
+    """
+    if method == "sasnip":
+        background = batchSasnip(data, diagnostics = diagnostics, **parameters)
+        return data - background, background
+    with timed(diagnostics, "snip"):
+        return calculate_batch_snip_background(data, **parameters)
@@ -0,0 +1,154 @@
+import argparse
+import csv
+import glob
+import json
+import os
+import sys
+from functools import partial
+from multiprocessing import Pool
+import numpy as np
+from .background import estimate_background
+from .diagnostics import backgroundDiagnostics
+from .loader import load_spectrum
+from .roi import roiIndex, roiTable
+
+def is_spectrum_file(fileName):
+    #Sidecar caches written by the loader are not spectra
+    return os.path.isfile(fileName) and not fileName.endswith((".npy", ".npy.tmp"))
+
+def find_files(inputs):
+    files = []
+    for path in inputs:
+        if os.path.isdir(path):
+            files += sorted(name for name in (os.path.join(path, name) for name in os.listdir(path)) if is_spectrum_file(name))
+        elif glob.has_magic(path):
+            files += sorted(name for name in glob.glob(path) if is_spectrum_file(name))
+        else:
+            files.append(path)
+    #A file given twice (e.g. its directory and a pattern) is processed once
+    unique = {}
+    for name in files:
+        unique.setdefault(os.path.abspath(name), name)
+    return list(unique.values())
+
+def output_names(files, outputDir):
+    """
+    Returns the path of the spectrum without background of each file: its name without extension followed by _nobkg.txt, in the subdirectory of outputDir given by the path of its directory relative to the directory common to all the files. Files with the same name in different directories are written to different subdirectories (files of a single directory are written to outputDir itself). Raises ValueError if two files still have the same output, e.g. run1.txt and run1.dat.
+    """
+    directories = [os.path.dirname(os.path.abspath(fileName)) for fileName in files]
+    root = os.path.commonpath(directories) if directories else ""
+    names = [os.path.normpath(os.path.join(outputDir, os.path.relpath(directory, root), os.path.splitext(os.path.basename(fileName))[0] + "_nobkg.txt")) for fileName, directory in zip(files, directories)]
+    first = {}
+    for fileName, name in zip(files, names):
+        if name in first:
+            raise ValueError("%s and %s would both be written to %s" % (first[name], fileName, name))
+        first[name] = fileName
+    return names
+
+def available_cores():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+def process_file(fileName, outputName, method = "sasnip", rois = (), sasnipParameters = None, snipParameters = None, sidecar = False, diagnostics = False):
+    """
+    Estimates the background of one spectrum file, writes the spectrum without background to outputName (see output_names) and returns the ROI counts (and, if diagnostics is true, the diagnostics of the estimation). Errors are returned instead of raised, so that a bad file does not stop a batch.
+
+    Returns
+    -------
+    fileName : str
+        The processed file.
+    counts : list of tuple or None
+        (minimum, maximum, raw counts and uncertainty, counts without background and uncertainty) of each ROI, None if the file failed.
+    error : str or None
+        The description of the error, None if the file was processed.
+    summary : dict or None
+        The summary of the backgroundDiagnostics of the estimation, None if diagnostics is false or the file failed.
+    """
+    try:
+        data = load_spectrum(fileName, sidecar)
+        parameters = sasnipParameters if method == "sasnip" else snipParameters
+        record = backgroundDiagnostics() if diagnostics else None
+        data_no_bkg, background = estimate_background(data, method, parameters or {}, diagnostics = record)
+        os.makedirs(os.path.dirname(outputName) or ".", exist_ok = True)
+        np.savetxt(outputName, data_no_bkg)
+        results = roiTable(("ROI %d" % number, low, high) for number, (low, high) in enumerate(rois)).evaluate(roiIndex(data, data_no_bkg))
+        counts = list(zip(results["low"], results["high"], results["counts"], results["countsError"], results["counts_no_bkg"], results["counts_no_bkgError"]))
+        return fileName, counts, None, None if record is None else record.summary()
+    except Exception as error:
+        return fileName, None, "%s: %s" % (type(error).__name__, error), None
+
+def process_job(job, **options):
+    #The (file, output) pairs of run_batch
+    return process_file(*job, **options)
+
+def run_batch(files, outputDir, method = "sasnip", rois = (), sasnipParameters = None, snipParameters = None, workers = None, chunksize = 1, sidecar = False, diagnostics = False):
+    """
+    Processes the files on a pool of processes (one per available core by default), writes the spectra without background to the paths given by output_names and the ROI counts to outputDir/roi_counts.csv as soon as each file is done, so memory does not grow with the number of files. If diagnostics is true, the diagnostics of every file are written to outputDir/diagnostics.jsonl, one JSON object per line.
+
+    Returns
+    -------
+    failed : list of tuple
+        (file name, error) of each file that could not be processed.
+    """
+    #Two files with the same output are an error before any file is processed
+    jobs = list(zip(files, output_names(files, outputDir)))
+    os.makedirs(outputDir, exist_ok = True)
+    worker = partial(process_job, method = method, rois = rois, sasnipParameters = sasnipParameters, snipParameters = snipParameters, sidecar = sidecar, diagnostics = diagnostics)
+    failed = []
+    diagnosticsFile = open(os.path.join(outputDir, "diagnostics.jsonl"), "w") if diagnostics else None
+    try:
+        with open(os.path.join(outputDir, "roi_counts.csv"), "w", newline = "") as countsFile, Pool(workers or available_cores()) as pool:
+            writer = csv.writer(countsFile)
+            writer.writerow(["file", "minimum", "maximum", "counts", "counts_error", "counts_no_bkg", "counts_no_bkg_error"])
+            for fileName, counts, error, summary in pool.imap_unordered(worker, jobs, chunksize):
+                if error is not None:
+                    failed.append((fileName, error))
+                    print("%s: %s" % (fileName, error), file = sys.stderr)
+                    continue
+                for roi in counts:
+                    writer.writerow([fileName] + list(roi))
+                countsFile.flush()
+                if diagnosticsFile is not None:
+                    diagnosticsFile.write(json.dumps(dict(summary, file = fileName, method = method)) + "\n")
+                    diagnosticsFile.flush()
+    finally:
+        if diagnosticsFile is not None:
+            diagnosticsFile.close()
+    return failed
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(prog = "python -m nda.batch", description = "Estimate the background of spectrum files without the GUI.")
+    parser.add_argument("inputs", nargs = "+", help = "spectrum files, directories or glob patterns")
+    parser.add_argument("-o", "--output", default = "output", help = "directory of the output files")
+    parser.add_argument("-m", "--method", choices = ["sasnip", "snip"], default = "sasnip")
+    parser.add_argument("-j", "--workers", type = int, default = None, help = "number of processes (default: available cores)")
+    parser.add_argument("--roi", nargs = 2, type = int, action = "append", default = [], metavar = ("MIN", "MAX"), help = "region of interest, may be repeated")
+    parser.add_argument("--sidecar", action = "store_true", help = "read and write .npy caches next to the spectrum files")
+    parser.add_argument("--diagnostics", action = "store_true", help = "write the stage times, iterations and convergence of every file to diagnostics.jsonl")
+    parser.add_argument("--no-decrease", action = "store_true", help = "apply the clipping windows in increasing order")
+    sasnipGroup = parser.add_argument_group("SASNIP options")
+    sasnipGroup.add_argument("--max", type = int, default = 100, help = "maximum base width of a peak")
+    sasnipGroup.add_argument("--threshold", type = float, default = 1, help = "derivative threshold")
+    sasnipGroup.add_argument("--no-smooth", action = "store_true", help = "do not smooth the spectrum before clipping")
+    sasnipGroup.add_argument("--max-iterations", type = int, default = None, help = "maximum number of clipping sweeps of each spectrum")
+    snipGroup = parser.add_argument_group("SNIP options")
+    snipGroup.add_argument("--mhw", type = int, default = 10, help = "maximum half window")
+    snipGroup.add_argument("--shw", type = int, default = 1, help = "smooth half window")
+    snipGroup.add_argument("--no-lls", action = "store_true", help = "do not apply the LLS operator")
+    snipGroup.add_argument("--filter-order", type = int, choices = [2, 4, 6, 8], default = 2)
+    args = parser.parse_args(argv)
+
+    files = find_files(args.inputs)
+    sasnipParameters = {"peakMaximum": args.max, "derivativeThreshold": args.threshold, "decrease": not args.no_decrease, "smooth": not args.no_smooth, "maxIterations": args.max_iterations}
+    snipParameters = {"mhw": args.mhw, "shw": args.shw, "decrease": not args.no_decrease, "lls": not args.no_lls, "fo": args.filter_order}
+    try:
+        failed = run_batch(files, args.output, args.method, args.roi, sasnipParameters, snipParameters, args.workers, sidecar = args.sidecar, diagnostics = args.diagnostics)
+    except ValueError as error:
+        parser.error(str(error))
+    print("%d files processed, %d failed" % (len(files) - len(failed), len(failed)))
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,86 @@
+import hashlib
+import inspect
+import threading
+from collections import OrderedDict
+import numpy as np
+from .sasnip import sasnip
+from .background import calculate_snip_background, estimate_background
+
+def spectrum_hash(data):
+    data = np.ascontiguousarray(data)
+    digest = hashlib.blake2b(digest_size = 16)
+    digest.update(str(data.dtype).encode())
+    digest.update(str(data.shape).encode())
+    digest.update(data.data)
+    return digest.hexdigest()
+
+def full_parameters(method, parameters):
+    #The defaults are included so that omitting a parameter and passing its default value give the same key
+    function = sasnip if method == "sasnip" else calculate_snip_background
+    arguments = inspect.signature(function).bind(None, **parameters)
+    arguments.apply_defaults()
+    return tuple(list(arguments.arguments.items())[1:])
+
+class backgroundCache:
+    """
+    Memoization of estimate_background. The results are kept in least recently used order and the oldest ones are evicted when the memory used by the stored arrays goes over maxBytes. Entries are keyed by a hash of the contents of the spectrum, the method and all the parameters of the method (defaults included), so changing the data or any parameter gives a new entry. The stored arrays are read-only.
+
+    Parameters
+    ----------
+    maxBytes : int, optional
+        The maximum memory used by the stored arrays.
+    """
+    def __init__(self, maxBytes = 256 * 2**20):
+        self.maxBytes = maxBytes
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def key(self, data, method, parameters):
+        return spectrum_hash(data), method, full_parameters(method, parameters)
+
+    def lookup(self, data, method, parameters):
+        key = self.key(data, method, parameters)
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+            self.misses += 1
+            return None
+
+    def store(self, data, method, parameters, result):
+        key = self.key(data, method, parameters)
+        result = tuple(np.array(array) for array in result)
+        for array in result:
+            array.flags.writeable = False
+        size = sum(array.nbytes for array in result)
+        if size > self.maxBytes:
+            return result
+        with self.lock:
+            if key in self.entries:
+                self.bytes -= sum(array.nbytes for array in self.entries.pop(key))
+            self.entries[key] = result
+            self.bytes += size
+            while self.bytes > self.maxBytes:
+                _, evicted = self.entries.popitem(last = False)
+                self.bytes -= sum(array.nbytes for array in evicted)
+        return result
+
+    def estimate(self, data, method, parameters):
+        result = self.lookup(data, method, parameters)
+        if result is None:
+            result = self.store(data, method, parameters, estimate_background(data, method, parameters))
+        return result
+
+    def statistics(self):
+        with self.lock:
+            requests = self.hits + self.misses
+            return {"hits": self.hits, "misses": self.misses, "hitRate": self.hits / requests if requests else 0.0, "entries": len(self.entries), "bytes": self.bytes, "maxBytes": self.maxBytes}
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
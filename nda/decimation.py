@@ -0,0 +1,74 @@
+import numpy as np
+
+def minmax_envelope(data, low, high, pixels):
+    """
+    Decimates the channels low to high - 1 of a spectrum for a plot that is `pixels` wide. The channels are split in about `pixels` bins of consecutive channels and each bin is replaced by its minimum and its maximum, at their own channels and in the order they appear, so the drawn line covers exactly the same vertical extent in every pixel column as the full data would. Ranges that are not wider than two channels per pixel are returned without decimation.
+
+    Parameters
+    ----------
+    data : numpy.ndarray
+        The values of the spectrum.
+    low, high : int
+        The range of channels to draw (clipped to the spectrum).
+    pixels : int
+        The width of the plot in pixels.
+
+    Returns
+    -------
+    x : numpy.ndarray
+        The channels of the points to draw.
+    y : numpy.ndarray
+        The values of the points to draw.
+    """
+    low = int(np.clip(low, 0, data.size))
+    high = int(np.clip(high, low, data.size))
+    pixels = max(int(pixels), 1)
+    if high - low <= 2 * pixels:
+        return np.arange(low, high), data[low:high]
+
+    width = -(-(high - low) // pixels)
+    bins = -(-(high - low) // width)
+    #The last bin is completed with its last value, which changes neither its minimum nor its maximum
+    values = np.pad(data[low:high], (0, bins * width - (high - low)), mode = 'edge').reshape(bins, width)
+    starts = low + width * np.arange(bins)
+    minima = starts + values.argmin(axis = 1)
+    maxima = starts + values.argmax(axis = 1)
+    x = np.empty(2 * bins, dtype = int)
+    x[0::2] = np.minimum(minima, maxima)
+    x[1::2] = np.maximum(minima, maxima)
+    return x, data[x]
+
+class lineDecimator:
+    """
+    Keeps the full data of the lines of a Matplotlib axes and gives each line only the min/max envelope (see minmax_envelope) of the channels inside the current x-range, at the current pixel width of the axes. The envelopes are computed again when the x-range (zoom, pan) or the size of the canvas change, so each view draws at most a few points per pixel whatever the number of channels.
+
+    Parameters
+    ----------
+    ax : matplotlib.axes.Axes
+        The axes of the lines.
+    """
+    def __init__(self, ax):
+        self.ax = ax
+        self.data = {}
+        ax.callbacks.connect("xlim_changed", self.refresh)
+        ax.figure.canvas.mpl_connect("resize_event", self.refresh)
+
+    def set_data(self, line, data):
+        """
+        Sets the values of line (one per channel, starting at channel 0).
+        """
+        self.data[line] = np.asarray(data)
+        self.refreshLine(line)
+
+    def get_data(self, line):
+        return self.data[line]
+
+    def refresh(self, *args):
+        for line in self.data:
+            self.refreshLine(line)
+
+    def refreshLine(self, line):
+        data = self.data[line]
+        left, right = sorted(self.ax.get_xlim())
+        #One channel beyond each side, so that the line reaches the borders of the plot
+        line.set_data(*minmax_envelope(data, np.floor(left) - 1, np.ceil(right) + 2, self.ax.bbox.width))
@@ -0,0 +1,93 @@
+import contextlib
+import time
+import numpy as np
+
+class backgroundDiagnostics:
+    """
+    Record of a background estimation: the time spent in each stage, the number of outer iterations of the SASNIP clipping, the parameter B of the stop condition after every iteration, the largest clipping window m and the number of peak regions of each spectrum. Give an instance as the diagnostics argument of sasnip.sasnip, sasnip.batchSasnip, sasnipPipeline.run or background.estimate_background and read it afterwards; without one nothing is measured.
+
+    Parameters
+    ----------
+    callback : callable, optional
+        Called as callback(diagnostics) after every outer iteration of the clipping, e.g. to show the progress of a long estimation.
+
+    Attributes
+    ----------
+    stages : dict
+        The seconds spent in each stage, in the order they ran (a stage that runs several times is added up).
+    iterations : numpy.ndarray
+        The outer iterations of each spectrum.
+    trace : list of list of float
+        The parameter B of each spectrum after every outer iteration.
+    m : numpy.ndarray
+        The largest clipping window of each spectrum.
+    peaks : numpy.ndarray
+        The number of peak regions of each spectrum.
+    stopReason : list of str
+        Why the clipping of each spectrum stopped: "tolerance" (the stop condition), "unchanged" (the last sweep changed no channel) or "maxIterations" (the iteration budget).
+    """
+    def __init__(self, callback = None):
+        self.callback = callback
+        self.stages = {}
+        self.iterations = np.zeros(0, dtype = int)
+        self.trace = []
+        self.m = np.zeros(0, dtype = int)
+        self.peaks = np.zeros(0, dtype = int)
+        self.stopReason = []
+
+    @contextlib.contextmanager
+    def timer(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+
+    def startClipping(self, m, peaks):
+        self.m = np.asarray(m, dtype = int)
+        self.peaks = np.asarray(peaks, dtype = int)
+        self.iterations = np.zeros(self.m.size, dtype = int)
+        self.trace = [[] for _ in range(self.m.size)]
+        self.stopReason = [""] * self.m.size
+
+    def iteration(self, rows, parameterB, stopReasons = None):
+        self.iterations[rows] += 1
+        for row, value in zip(rows, parameterB):
+            self.trace[row].append(float(value))
+        if stopReasons is not None:
+            for row, reason in zip(rows, stopReasons):
+                if reason:
+                    self.stopReason[row] = str(reason)
+        if self.callback is not None:
+            self.callback(self)
+
+    @property
+    def totalTime(self):
+        return sum(self.stages.values())
+
+    def summary(self):
+        """
+        Returns the diagnostics as a dictionary of plain Python values (e.g. for JSON). The values of the spectra are lists, or single values when only one spectrum was estimated.
+        """
+        def values(array):
+            return array.tolist() if array.size != 1 else array.item()
+        return {"stages": dict(self.stages), "totalTime": self.totalTime, "iterations": values(self.iterations), "m": values(self.m), "peaks": values(self.peaks), "trace": self.trace if len(self.trace) != 1 else self.trace[0], "stopReason": self.stopReason if len(self.stopReason) != 1 else self.stopReason[0]}
+
+    def report(self):
+        """
+        Returns a readable description of the diagnostics.
+        """
+        lines = ["%-12s %9.2f ms" % (name, 1000 * seconds) for name, seconds in self.stages.items()]
+        lines.append("%-12s %9.2f ms" % ("total", 1000 * self.totalTime))
+        for row in range(self.m.size):
+            prefix = "" if self.m.size == 1 else "spectrum %d: " % row
+            lines.append("%s%d peak regions, m = %d, %d iterations (stopped by %s)" % (prefix, self.peaks[row], self.m[row], self.iterations[row], self.stopReason[row] or "-"))
+            if self.trace[row]:
+                lines.append("%sparameter B: %s" % (prefix, ", ".join("%.6g" % value for value in self.trace[row])))
+        return "\n".join(lines)
+
+def timed(diagnostics, name):
+    """
+    Returns diagnostics.timer(name), or a context manager that does nothing when diagnostics is None.
+    """
+    return contextlib.nullcontext() if diagnostics is None else diagnostics.timer(name)
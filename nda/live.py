@@ -0,0 +1,253 @@
+import os
+import re
+import socket
+import socketserver
+import threading
+import time
+import numpy as np
+from .background import estimate_background
+from .loader import contentLine, parse_spectrum, to_array
+
+class liveSpectrum:
+    """
+    Spectrum of an acquisition in progress. The counts are accumulated in place by add (or replaced by replace when a new snapshot of the whole spectrum is read) and every change increments version, so readers only copy the counts when they changed. The spectrum grows when a count arrives in a channel beyond its end, up to maxChannels channels, so that a corrupted event (e.g. a channel of 1e9) can not allocate gigabytes. All the methods can be called from several threads.
+
+    Parameters
+    ----------
+    channels : int, optional
+        The initial number of channels.
+    maxChannels : int, optional
+        The largest number of channels. Events in channels from maxChannels on are rejected.
+
+    Attributes
+    ----------
+    rejected : int
+        The number of events rejected so far (negative, non-finite or too large channels).
+    """
+    def __init__(self, channels = 0, maxChannels = 65536):
+        self.counts = np.zeros(channels)
+        self.maxChannels = max(maxChannels, channels)
+        self.version = 0
+        self.rejected = 0
+        self.lock = threading.Lock()
+
+    def add(self, channels, counts = None):
+        """
+        Adds counts (one count per channel if not given) to the given channels. Negative, non-finite and too large channels (see maxChannels) are rejected.
+        """
+        channels = np.ravel(np.asarray(channels, dtype = float))
+        counts = np.ones(channels.size) if counts is None else np.broadcast_to(np.asarray(counts, dtype = float), channels.shape)
+        valid = np.isfinite(channels) & (channels >= 0) & (channels < self.maxChannels)
+        channels, counts = channels[valid].astype(int), counts[valid]
+        with self.lock:
+            self.rejected += valid.size - channels.size
+            if channels.size == 0:
+                return
+            if channels.max() >= self.counts.size:
+                self.counts = np.concatenate([self.counts, np.zeros(channels.max() + 1 - self.counts.size)])
+            np.add.at(self.counts, channels, counts)
+            self.version += 1
+
+    def replace(self, values):
+        with self.lock:
+            if np.shape(values) == self.counts.shape:
+                np.copyto(self.counts, values)
+            else:
+                self.counts = np.array(values, dtype = float)
+            self.version += 1
+
+    def clear(self):
+        with self.lock:
+            self.counts[:] = 0
+            self.version += 1
+
+    def snapshot(self):
+        """
+        Returns a copy of the counts and the version they belong to.
+        """
+        with self.lock:
+            return self.counts.copy(), self.version
+
+def parse_events(text, comments = '$'):
+    """
+    Parses lines of events: each line holds a channel, optionally followed by the number of counts to add to it (1 if it is missing). Comments and empty lines are skipped as in loader.parse_spectrum.
+
+    Returns
+    -------
+    channels : numpy.ndarray
+    counts : numpy.ndarray or None
+        None when every line only holds a channel.
+    """
+    if comments in text:
+        text = re.sub(re.escape(comments) + "[^\n]*", "", text)
+    values = text.split()
+    if len(values) == len(contentLine.findall(text)):
+        return to_array(values), None
+    rows = [line.split() for line in text.splitlines()]
+    rows = [row for row in rows if row]
+    return to_array([row[0] for row in rows]), to_array([row[1] if len(row) > 1 else "1" for row in rows])
+
+class eventStream:
+    """
+    Adds the events of a text stream to a liveSpectrum. The text may arrive in pieces of any size: only complete lines are parsed and the rest is kept until the next piece.
+    """
+    def __init__(self, spectrum):
+        self.spectrum = spectrum
+        self.pending = ""
+
+    def feed(self, text):
+        text = self.pending + text
+        end = text.rfind("\n") + 1
+        self.pending = text[end:]
+        if end:
+            self.spectrum.add(*parse_events(text[:end]))
+
+    def flush(self):
+        self.feed("\n")
+
+class fileFollower:
+    """
+    Follows a spectrum file that is written during the acquisition.
+
+    With events = False the file holds the whole spectrum (see loader.parse_spectrum) and the acquisition software rewrites it with the updated counts: every time the size or the modification time of the file change, it is read again and its values replace the counts. A snapshot with fewer channels than the spectrum is taken as a file still being written and read again at the next poll.
+
+    With events = True the file is a list of events (see parse_events) to which new lines are appended: only the bytes added since the last poll are read and their counts are added to the spectrum. If the file becomes shorter, the acquisition is taken as restarted and the spectrum is cleared.
+
+    Parameters
+    ----------
+    path : str
+        The path of the file.
+    spectrum : liveSpectrum, optional
+        The spectrum the counts are accumulated in. A new one is created if not given.
+    events : bool, optional
+        Whether the file is a list of events instead of a spectrum.
+    """
+    def __init__(self, path, spectrum = None, events = False):
+        self.path = path
+        self.events = events
+        self.spectrum = liveSpectrum() if spectrum is None else spectrum
+        self.stream = eventStream(self.spectrum)
+        self.offset = 0
+        self.status = None
+
+    def poll(self):
+        """
+        Reads the changes of the file since the last call. Returns True if the file changed.
+        """
+        status = os.stat(self.path)
+        if (status.st_size, status.st_mtime_ns) == self.status:
+            return False
+        self.status = (status.st_size, status.st_mtime_ns)
+        if not self.events:
+            with open(self.path, "r", encoding = "latin-1") as spectrumFile:
+                try:
+                    data = parse_spectrum(spectrumFile.read())
+                except ValueError:
+                    data = np.empty(0)
+            if data.size < self.spectrum.counts.size or data.size == 0:
+                self.status = None
+                return False
+            self.spectrum.replace(data)
+            return True
+        if status.st_size < self.offset:
+            self.offset = 0
+            self.stream.pending = ""
+            self.spectrum.clear()
+        with open(self.path, "rb") as eventFile:
+            eventFile.seek(self.offset)
+            chunk = eventFile.read()
+        self.offset += len(chunk)
+        self.stream.feed(chunk.decode("latin-1"))
+        return True
+
+    def close(self):
+        pass
+
+class eventHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        stream = eventStream(self.server.spectrum)
+        while True:
+            chunk = self.request.recv(65536)
+            if not chunk:
+                break
+            stream.feed(chunk.decode("latin-1"))
+        stream.flush()
+
+class socketSource:
+    """
+    Local TCP server that adds the events sent by its clients (see parse_events and send_events) to a liveSpectrum. Every connection is served by its own thread as the data arrives, so poll has nothing to do.
+
+    Parameters
+    ----------
+    spectrum : liveSpectrum, optional
+        The spectrum the counts are accumulated in. A new one is created if not given.
+    host : str, optional
+        The address the server listens on.
+    port : int, optional
+        The port the server listens on (0 chooses a free port, see address).
+    """
+    def __init__(self, spectrum = None, host = "127.0.0.1", port = 0):
+        self.spectrum = liveSpectrum() if spectrum is None else spectrum
+        self.server = socketserver.ThreadingTCPServer((host, port), eventHandler)
+        self.server.daemon_threads = True
+        self.server.spectrum = self.spectrum
+        self.thread = threading.Thread(target = self.server.serve_forever, daemon = True)
+        self.thread.start()
+
+    @property
+    def address(self):
+        return self.server.server_address
+
+    def poll(self):
+        return False
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+def send_events(address, channels, counts = None):
+    """
+    Sends events to a socketSource at address (host, port), e.g. from a test harness that simulates an acquisition.
+    """
+    if counts is None:
+        lines = ["%d\n" % channel for channel in np.ravel(channels)]
+    else:
+        lines = ["%d %g\n" % pair for pair in zip(np.ravel(channels), np.ravel(counts))]
+    with socket.create_connection(address) as connection:
+        connection.sendall("".join(lines).encode())
+
+class liveBackground:
+    """
+    Throttled background estimation of a liveSpectrum: update recomputes the background at most once every interval seconds, and only if the counts changed. Every estimation starts from the counts themselves, since the clipping of a previous background would lower it further at every update.
+
+    Parameters
+    ----------
+    method : {'sasnip', 'snip'}, optional
+        The background estimation method.
+    parameters : dict, optional
+        Keyword arguments of sasnip.sasnip or background.calculate_snip_background.
+    interval : float, optional
+        The minimum time between two estimations, in seconds.
+    """
+    def __init__(self, method = "sasnip", parameters = None, interval = 1.0):
+        self.method = method
+        self.parameters = parameters or {}
+        self.interval = interval
+        self.time = -np.inf
+        self.version = None
+        self.data = None
+        self.background = None
+
+    def update(self, spectrum, force = False):
+        """
+        Returns (data, data without background, background) if the background was recomputed and None otherwise. With force = True the interval is not waited for.
+        """
+        if not force and time.monotonic() - self.time < self.interval:
+            return None
+        data, version = spectrum.snapshot()
+        if version == self.version or not data.any():
+            return None
+        self.time = time.monotonic()
+        data_no_bkg, background = estimate_background(data, self.method, self.parameters)
+        self.data, self.background, self.version = data, background, version
+        return data, data_no_bkg, background
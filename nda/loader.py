@@ -0,0 +1,125 @@
+import os
+import re
+import numpy as np
+
+contentLine = re.compile(r"^[^\S\n]*\S", re.MULTILINE)
+
+def parse_spectrum(text, comments = '$'):
+    """
+    This function parses the text of a spectrum file in a single pass. Everything after the comment character is ignored, empty lines are skipped and the values of all the lines are read in order (several columns are read line by line). All the lines must have the same number of values, except the last one, which is considered a footer and dropped. Values that are not numbers are read as nan. This gives the same result as np.genfromtxt(fileName, comments = '$'), retried with skip_footer = 1 when it fails, as window.openFile did.
+
+    Parameters
+    ----------
+    text : str
+        The contents of the spectrum file.
+    comments : str, optional
+        The character that starts a comment.
+
+    Returns
+    -------
+    data : numpy.ndarray
+        1-D array with the values of the spectrum.
+    """
+    if comments in text:
+        text = re.sub(re.escape(comments) + "[^\n]*", "", text)
+    values = text.split()
+    #Usual case: one value in each line, read without splitting the lines
+    if len(values) == len(contentLine.findall(text)):
+        return to_array(values)
+
+    rows = []
+    for line in text.splitlines():
+        values = line.split()
+        if values:
+            rows.append(values)
+    if not rows:
+        return np.array([])
+
+    columns = len(rows[0])
+    if len(rows[-1]) != columns:
+        rows.pop()
+    for row in rows:
+        if len(row) != columns:
+            raise ValueError("inconsistent number of columns in the spectrum file")
+
+    return to_array([value for row in rows for value in row])
+
+def to_array(values):
+    try:
+        return np.array(values, dtype = float)
+    except ValueError:
+        return np.array([to_float(value) for value in values], dtype = float)
+
+def to_float(value):
+    try:
+        return float(value)
+    except ValueError:
+        return np.nan
+
+def only_file_name(fileName):
+    """
+    Splits a path at its last '/' and returns (file name, directory).
+    """
+    dirName, _, fileName = fileName.rpartition('/')
+    return fileName, dirName
+
+def sidecar_name(fileName):
+    return fileName + ".npy"
+
+def read_sidecar(fileName):
+    """
+    Returns the values stored in the sidecar cache of fileName, memory-mapped, or None if there is no cache or if the size or the modification time of fileName changed since it was written.
+    """
+    try:
+        status = os.stat(fileName)
+        cached = np.load(sidecar_name(fileName), mmap_mode = 'r')
+    except (OSError, ValueError):
+        return None
+    if cached.dtype.names != ("size", "mtime", "values") or cached.shape != (1,):
+        return None
+    if cached["size"][0] != status.st_size or cached["mtime"][0] != status.st_mtime_ns:
+        return None
+    return cached["values"][0]
+
+def write_sidecar(fileName, data):
+    """
+    Writes data to the sidecar cache of fileName (fileName + ".npy"), together with the size and the modification time of fileName. The values and the validation fields are in a single record, so the cache is one ordinary .npy file. Errors (e.g. a read-only directory) are ignored, since the cache is optional.
+    """
+    try:
+        status = os.stat(fileName)
+        record = np.zeros(1, dtype = [("size", "<i8"), ("mtime", "<i8"), ("values", "<f8", (data.size,))])
+        record["size"] = status.st_size
+        record["mtime"] = status.st_mtime_ns
+        record["values"] = data
+        temporaryName = sidecar_name(fileName) + ".tmp"
+        with open(temporaryName, "wb") as sidecar:
+            np.save(sidecar, record)
+        os.replace(temporaryName, sidecar_name(fileName))
+    except OSError:
+        pass
+
+def load_spectrum(fileName, sidecar = False):
+    """
+    This function loads a spectrum file (see parse_spectrum for the format).
+
+    Parameters
+    ----------
+    fileName : str
+        The path of the spectrum file.
+    sidecar : bool, optional
+        If true, the values are read from the sidecar cache of the file when it is still valid (memory-mapped and read-only) and the cache is written after parsing otherwise.
+
+    Returns
+    -------
+    data : numpy.ndarray
+        1-D array with the values of the spectrum.
+    """
+    if sidecar:
+        data = read_sidecar(fileName)
+        if data is not None:
+            return data
+    with open(fileName, "r", encoding = "latin-1") as spectrumFile:
+        data = parse_spectrum(spectrumFile.read())
+    if sidecar:
+        write_sidecar(fileName, data)
+    return data
@@ -0,0 +1,152 @@
+import os
+import warnings
+from multiprocessing import Pool
+import numpy as np
+from .batch import available_cores
+from .sasnip import llsTransform
+
+def snip_2d(data, m, decreasing = False):
+    """
+    This function executes the two-dimensional SNIP algorithm [1] on a matrix, as in TSpectrum2::Background of ROOT (second order successive filtering). For each clipping window i, every element at least i rows and i columns away from the borders is replaced by the minimum of its value and the estimate given by its eight neighbours at distance i (the four corners and the four sides of the square of half width i), all of them taken from the previous window.
+
+    Parameters
+    ----------
+    data : numpy.ndarray
+        2-D array with the (usually LLS transformed) matrix.
+    m : int
+        The largest clipping window.
+    decreasing : bool, optional
+        If true, the windows are applied from m to 1, otherwise from 1 to m.
+
+    Returns
+    -------
+    background : numpy.ndarray
+        The clipped matrix.
+
+    References
+    ----------
+    .. [1] M. Morháč, J. Kliman, V. Matoušek, M. Veselský and I. Turzo, “Background elimination methods for multidimensional coincidence γ-ray spectra,” Nuclear Instruments and Methods in Physics Research Section A, vol. 401, no. 1, pp. 113-132, 1997.
+    """
+    background = np.array(data, dtype = float)
+    windows = range(m, 0, -1) if decreasing else range(1, m + 1)
+    for i in windows:
+        if 2 * i >= min(background.shape):
+            continue
+        inner = (slice(i, -i), slice(i, -i))
+        #Corners (x -/+ i, y -/+ i) and sides of the square around each element
+        p1, p2 = background[:-2 * i, :-2 * i], background[:-2 * i, 2 * i:]
+        p3, p4 = background[2 * i:, :-2 * i], background[2 * i:, 2 * i:]
+        s1, s2 = background[i: -i, :-2 * i], background[:-2 * i, i: -i]
+        s3, s4 = background[2 * i:, i: -i], background[i: -i, 2 * i:]
+        #Each side is compared with the average of its two corners; only the part above it is kept
+        estimate = (p1 + p2 + p3 + p4) / 4
+        estimate += np.maximum(s1 - (p1 + p3) / 2, 0) / 2
+        estimate += np.maximum(s4 - (p2 + p4) / 2, 0) / 2
+        estimate += np.maximum(s2 - (p1 + p2) / 2, 0) / 2
+        estimate += np.maximum(s3 - (p3 + p4) / 2, 0) / 2
+        np.minimum(background[inner], estimate, out = estimate)
+        background[inner] = estimate
+    return background
+
+def calculate_matrix_background(data, m, decreasing = False, lls = True):
+    """
+    Returns the matrix without background and the background given by snip_2d, applied to the LLS transform of the matrix if lls is true (as calculate_snip_background does for spectra).
+    """
+    data = np.asarray(data, dtype = float)
+    if lls:
+        background = snip_2d(llsTransform(data), m, decreasing)
+        background = -1 + (np.exp(np.exp(background) - 1) - 1) ** 2
+    else:
+        background = snip_2d(data, m, decreasing)
+    return data - background, background
+
+def matrix_halo(m):
+    #Window i reads elements i channels away, so after the windows 1 to m an element depends on the elements up to 1 + 2 + ... + m channels away
+    return m * (m + 1) // 2
+
+def matrix_tiles(shape, tileSize):
+    """
+    Yields (row start, row end, column start, column end) of the tiles of at most tileSize x tileSize elements that cover a matrix.
+    """
+    for row in range(0, shape[0], tileSize):
+        for column in range(0, shape[1], tileSize):
+            yield row, min(row + tileSize, shape[0]), column, min(column + tileSize, shape[1])
+
+worker = {}
+
+def start_worker(matrix, outputPath, m, decreasing, lls, halo):
+    data = np.load(matrix, mmap_mode = 'r') if isinstance(matrix, str) else matrix
+    worker.update(data = data, output = np.load(outputPath, mmap_mode = 'r+'), m = m, decreasing = decreasing, lls = lls, halo = halo)
+
+def process_tile(tile):
+    #The tile is estimated together with a halo around it, which is dropped when the result is written
+    row, rowEnd, column, columnEnd = tile
+    data, halo = worker["data"], worker["halo"]
+    top, left = max(row - halo, 0), max(column - halo, 0)
+    bottom, right = min(rowEnd + halo, data.shape[0]), min(columnEnd + halo, data.shape[1])
+    background = calculate_matrix_background(data[top: bottom, left: right], worker["m"], worker["decreasing"], worker["lls"])[1]
+    worker["output"][row: rowEnd, column: columnEnd] = background[row - top: rowEnd - top, column - left: columnEnd - left]
+    worker["output"].flush()
+    return tile
+
+def estimate_matrix_background(matrix, outputPath, m, decreasing = False, lls = True, tileSize = 1024, halo = None, workers = None):
+    """
+    This function estimates the background of a large matrix (e.g. a gamma-gamma coincidence matrix) with calculate_matrix_background, one tile at a time, so that only a few tiles are in memory at any time. Every tile is estimated together with a halo of the surrounding elements and only its own elements are kept. The tiles run in parallel on a pool of processes and write their backgrounds to a memory-mapped .npy file.
+
+    Parameters
+    ----------
+    matrix : str or numpy.ndarray
+        The path of a .npy file with the matrix (memory-mapped by every process) or the matrix itself. An array is estimated in this process when workers is 1, and is otherwise written to a temporary .npy file next to outputPath first.
+    outputPath : str
+        The path of the .npy file of the background (overwritten if it exists).
+    m : int
+        The largest clipping window.
+    decreasing : bool, optional
+        If true, the windows are applied from m to 1, otherwise from 1 to m.
+    lls : bool, optional
+        Whether the clipping is applied to the LLS transform of the matrix.
+    tileSize : int, optional
+        The number of rows and columns of each tile, without its halo.
+    halo : int, optional
+        The number of rows and columns added around each tile. The default, m (m + 1) / 2, is the distance at which the clipping windows reach, and gives the same background as the whole matrix; smaller halos are faster, but the background of the elements near the borders of the tiles is only approximate. The memory of every process grows with (tileSize + 2 halo)^2 and the default halo with m^2, so memory is only bounded for small m: at m = 100 (a halo of 5050) a tile of an 8192 x 8192 matrix with its halo is as large as the whole matrix. A RuntimeWarning is given when tileSize + 2 halo reaches the size of the matrix.
+    workers : int, optional
+        The number of processes (default: available cores).
+
+    Returns
+    -------
+    background : numpy.memmap
+        The background, memory-mapped read-only from outputPath.
+    """
+    halo = matrix_halo(m) if halo is None else halo
+    if isinstance(matrix, str):
+        shape = np.load(matrix, mmap_mode = 'r').shape
+    else:
+        matrix = np.asarray(matrix)
+        shape = matrix.shape
+    if len(shape) != 2:
+        raise ValueError("the matrix must be a 2-D array")
+    tiles = list(matrix_tiles(shape, tileSize))
+    if len(tiles) > 1 and tileSize + 2 * halo >= max(shape):
+        warnings.warn("with a halo of %d elements the tiles are as large as the whole %d x %d matrix, so they do not bound the memory; use a smaller m or halo" % (halo, shape[0], shape[1]), RuntimeWarning, stacklevel = 2)
+    workers = min(workers or available_cores(), len(tiles))
+
+    np.lib.format.open_memmap(outputPath, mode = 'w+', dtype = np.float64, shape = shape).flush()
+    temporaryPath = None
+    try:
+        if workers <= 1:
+            start_worker(matrix, outputPath, m, decreasing, lls, halo)
+            for tile in tiles:
+                process_tile(tile)
+        else:
+            if not isinstance(matrix, str):
+                temporaryPath = outputPath + ".input.npy"
+                np.save(temporaryPath, matrix)
+                matrix = temporaryPath
+            with Pool(workers, start_worker, (matrix, outputPath, m, decreasing, lls, halo)) as pool:
+                for _ in pool.imap_unordered(process_tile, tiles):
+                    pass
+    finally:
+        worker.clear()
+        if temporaryPath is not None and os.path.exists(temporaryPath):
+            os.remove(temporaryPath)
+    return np.load(outputPath, mmap_mode = 'r')
@@ -0,0 +1,97 @@
+from collections import OrderedDict
+import numpy as np
+
+def prefix_sums(data):
+    """
+    Returns the cumulative sums of data along the last axis with a leading zero, so that the sum of the channels low to high - 1 is sums[..., high] - sums[..., low].
+    """
+    data = np.asarray(data, dtype = float)
+    sums = np.zeros(data.shape[:-1] + (data.shape[-1] + 1,))
+    np.cumsum(data, axis = -1, out = sums[..., 1:])
+    return sums
+
+class roiIndex:
+    """
+    Cumulative sums of a spectrum (or of a 2-D array with one spectrum per row) and of the same spectrum without background, so that the counts of any region of interest are computed in constant time. The sums are only rebuilt by update, when the data or the background change.
+
+    As in window.count, a region goes from channel low to channel high - 1. The uncertainties assume Poisson statistics: sqrt(counts) for the raw counts and sqrt(counts + background counts) for the counts without background.
+    """
+    def __init__(self, data = None, data_no_bkg = None):
+        self.sums = None
+        self.sums_no_bkg = None
+        self.update(data, data_no_bkg)
+
+    def update(self, data = None, data_no_bkg = None):
+        if data is not None:
+            self.sums = prefix_sums(data)
+            self.sums_no_bkg = None
+        if data_no_bkg is not None:
+            self.sums_no_bkg = prefix_sums(data_no_bkg)
+
+    @property
+    def hasBackground(self):
+        return self.sums_no_bkg is not None
+
+    def counts(self, low, high, subtracted = False):
+        sums = self.sums_no_bkg if subtracted else self.sums
+        if sums is None:
+            raise ValueError("no background has been given" if subtracted else "no data has been given")
+        low = np.clip(low, 0, sums.shape[-1] - 1)
+        high = np.clip(high, low, sums.shape[-1] - 1)
+        return sums[..., high] - sums[..., low]
+
+    def uncertainty(self, low, high, subtracted = False):
+        raw = self.counts(low, high)
+        if not subtracted:
+            return np.sqrt(np.maximum(raw, 0))
+        background = raw - self.counts(low, high, True)
+        return np.sqrt(np.maximum(raw + background, 0))
+
+class roiTable:
+    """
+    Table of named regions of interest, evaluated all at once against a roiIndex of one spectrum or of many spectra.
+    """
+    def __init__(self, rois = ()):
+        self.rois = OrderedDict()
+        for name, low, high in rois:
+            self.add(name, low, high)
+
+    def add(self, name, low, high):
+        if high < low:
+            low, high = high, low
+        self.rois[name] = (int(low), int(high))
+
+    def remove(self, name):
+        del self.rois[name]
+
+    def clear(self):
+        self.rois.clear()
+
+    def __len__(self):
+        return len(self.rois)
+
+    def __iter__(self):
+        return ((name, low, high) for name, (low, high) in self.rois.items())
+
+    def evaluate(self, index):
+        """
+        Evaluates every region of the table.
+
+        Parameters
+        ----------
+        index : roiIndex
+            The cumulative sums of the spectrum or of the spectra.
+
+        Returns
+        -------
+        results : dict
+            The names, low and high channels of the regions and their counts and uncertainties ("counts", "countsError" and, if the index has a background, "counts_no_bkg" and "counts_no_bkgError"). The counts have shape (number of regions,) for one spectrum and (number of spectra, number of regions) for a 2-D array.
+        """
+        names = list(self.rois)
+        low = np.array([self.rois[name][0] for name in names], dtype = int)
+        high = np.array([self.rois[name][1] for name in names], dtype = int)
+        results = {"names": names, "low": low, "high": high, "counts": index.counts(low, high), "countsError": index.uncertainty(low, high)}
+        if index.hasBackground:
+            results["counts_no_bkg"] = index.counts(low, high, True)
+            results["counts_no_bkgError"] = index.uncertainty(low, high, True)
+        return results
@@ -0,0 +1,648 @@
+import numpy as np
+from .diagnostics import timed
+
+def smoothSignal(signal):
+    """
+    This function smooths the signal with the one which was considered as the best smoothing method for low-statistics spectra. The signal is padded in both sides with the values of the edges in order to return an array with the same size of the signal. The filter is applied as a sum of shifted copies of the padded signal, along the last axis (a 2-D array holds one spectrum per row).
+
+    Parameters
+    ----------
+    signal : array-like
+        The values of the measured data, i.e. the spectrum itself.
+
+    Returns
+    -------
+    smoothedSignal : numpy.ndarray
+        The smoothed signal.
+        
+    References
+    ----------
+    .. [1] M. Morháč, “Multidimensional peak searching algorithm for low-statistics nuclear spectra,” Nuclear Instruments and Methods in Physics Research Section A: Accelerators, Spectrometers, Detectors and Associated Equipment, vol. 581, no. 3, pp. 821-830, 2007.
+    """
+    signal = np.asarray(signal)
+    paddedSignal = np.pad(signal, [(0, 0)] * (signal.ndim - 1) + [(2, 2)], mode = 'edge')
+    size = signal.shape[-1]
+
+    return 1/9 * (paddedSignal[..., 0: size] + 2 * paddedSignal[..., 1: size + 1] + 3 * paddedSignal[..., 2: size + 2] + 2 * paddedSignal[..., 3: size + 3] + paddedSignal[..., 4: size + 4])
+
+def firstDerivative(signal):
+    """
+    This function calculates de first derivative of the signal. The signal is padded in both sides with the values of the edges in order to return an array with the same size of the signal. The derivative is calculated along the last axis.
+
+    Parameters
+    ----------
+    signal : array-like
+        The values of the measured data, i.e. the spectrum itself.
+
+    Returns
+    -------
+    firstDerivative : numpy.ndarray
+        The first derivative of the signal.
+    """
+    signal = np.asarray(signal)
+    paddedSignal = np.pad(signal, [(0, 0)] * (signal.ndim - 1) + [(1, 1)], mode = 'edge')
+    size = signal.shape[-1]
+
+    return 1/2 * (- paddedSignal[..., 0: size] + paddedSignal[..., 2: size + 2])
+
+def findPeaks(signal, peakMinimum = 4, peakMaximum = 100, derivativeThreshold = 0):
+    """
+    This function finds the regions of the peaks and fills an array with the values of the FWHM (full width at half maximum) in those regions of the array. To do so, this function calculates the first derivative of the input signal, evaluates where the derivative crosses y = 0 and determines the regions of the peaks based on whether the crossing happens from a positive value to a negative value or vice-versa. Since the noise of the signal can have a big impact in the peak identification, it is possible to apply some constraints to peak identification, such as minimum and maximum peak sizes (base width, not FWHM) and a threshold value the derivative must reach to be considered a peak (Warning: this parameter may impact greatly the results).
+
+    Parameters
+    ----------
+    signal : array-like
+        The values of the measured data, i.e. the spectrum itself.
+    peakMinimum : int, optional
+        The minimum base width (not FWHM) that a peak must have.
+    peakMaximum : int, optional
+        The maximum base width (not FWHM) that a peak must have.
+    derivativeThreshold : float, optional
+        The value that the derivative must cross (both in the positive and negative sides of the derivative of the peak) in order to consider a certain region as a valid peak. (Warning: this parameter may impact greatly the results)
+    
+    Returns
+    -------
+    fwhmArray : numpy.ndarray
+        Array containing the values of the FWHM in the base width regions of the peak.
+    """
+    smoothedSignal = smoothSignal(signal)
+    #smoothedSignal = smoothSignal(smoothedSignal)
+    #smoothedSignal = smoothSignal(smoothedSignal)
+    signalPrime = firstDerivative(smoothedSignal)
+    return derivativePeaks(signalPrime, peakMinimum, peakMaximum, derivativeThreshold)
+
+def findPeakTable(signal, peakMinimum = 4, peakMaximum = 100, derivativeThreshold = 0):
+    """
+    This function finds the regions of the peaks like the findPeaks function, but returns them as a peakTable (one row per peak region) instead of an array with one value per channel.
+
+    Parameters
+    ----------
+    signal : array-like
+        The values of the measured data, i.e. the spectrum itself.
+    peakMinimum : int, optional
+        The minimum base width (not FWHM) that a peak must have.
+    peakMaximum : int, optional
+        The maximum base width (not FWHM) that a peak must have.
+    derivativeThreshold : float, optional
+        The value that the derivative must cross in order to consider a certain region as a valid peak.
+
+    Returns
+    -------
+    table : peakTable
+        The regions of the peaks.
+    """
+    return derivativePeakTable(firstDerivative(smoothSignal(signal)), peakMinimum, peakMaximum, derivativeThreshold)
+
+def derivativePeaks(signalPrime, peakMinimum = 4, peakMaximum = 100, derivativeThreshold = 0):
+    """
+    This function executes the peak identification of the findPeaks function from the first derivative of the smoothed signal, so that the derivative can be computed once and reused when only the peak constraints change.
+
+    Parameters
+    ----------
+    signalPrime : numpy.ndarray
+        The first derivative of the smoothed signal.
+    peakMinimum : int, optional
+        The minimum base width (not FWHM) that a peak must have.
+    peakMaximum : int, optional
+        The maximum base width (not FWHM) that a peak must have.
+    derivativeThreshold : float, optional
+        The value that the derivative must cross in order to consider a certain region as a valid peak.
+
+    Returns
+    -------
+    fwhmArray : numpy.ndarray
+        Array containing the values of the FWHM in the base width regions of the peak.
+    """
+    return derivativePeakTable(signalPrime, peakMinimum, peakMaximum, derivativeThreshold).fwhmArray()
+
+def derivativePeakTable(signalPrime, peakMinimum = 4, peakMaximum = 100, derivativeThreshold = 0):
+    """
+    This function identifies the peaks from the first derivative of the smoothed signal (see findPeaks) and returns their regions as a peakTable.
+
+    Parameters
+    ----------
+    signalPrime : numpy.ndarray
+        The first derivative of the smoothed signal.
+    peakMinimum : int, optional
+        The minimum base width (not FWHM) that a peak must have.
+    peakMaximum : int, optional
+        The maximum base width (not FWHM) that a peak must have.
+    derivativeThreshold : float, optional
+        The value that the derivative must cross in order to consider a certain region as a valid peak.
+
+    Returns
+    -------
+    table : peakTable
+        The regions of the peaks.
+    """
+    size = signalPrime.size
+    if (size < 2):
+        return peakTable.empty(size)
+
+    #Crossings of y = 0: -1 in both channels of a crossing from positive to negative, 1 from negative to positive (a later crossing overwrites the shared channel)
+    crossing = np.zeros(size - 1)
+    crossing[(signalPrime[:-1] > 0) & (signalPrime[1:] <= 0)] = -1
+    crossing[(signalPrime[:-1] < 0) & (signalPrime[1:] >= 0)] = 1
+    zeroCrossing = np.zeros(size)
+    zeroCrossing[1:] = crossing
+    zeroCrossing[:-1] = np.where(crossing != 0, crossing, zeroCrossing[:-1])
+
+    #A maximum in the first channel takes its left boundary from the end of the spectrum (the negative indexes of the original scan). If it is too small to be a peak, both of its regions are cleared before the other maxima are evaluated; otherwise it has no left side and is ignored
+    if (zeroCrossing[0] == -1 and zeroCrossing[1] == -1):
+        search = min(int(peakMaximum/2) - 1, size - 2)
+        endMinima = np.flatnonzero(zeroCrossing[size - max(search, 0):][::-1] == 1)
+        startMinima = np.flatnonzero(zeroCrossing[2: 2 + max(search, 0)] == 1)
+        if (endMinima.size and startMinima.size and endMinima[0] + startMinima[0] + 2 <= peakMinimum):
+            zeroCrossing[size - endMinima[0] - 1:] = 0
+            zeroCrossing[: startMinima[0] + 2] = 0
+
+    #Maxima are two consecutive -1; their boundaries are the nearest 1 on each side, within int(peakMaximum/2) - 1 channels and without reaching the first or the last channel
+    maxima = np.flatnonzero((zeroCrossing[:-1] == -1) & (zeroCrossing[1:] == -1))
+    minima = np.flatnonzero(zeroCrossing == 1)
+    if (maxima.size == 0 or minima.size == 0):
+        return peakTable.empty(size)
+    nextMinimum = np.searchsorted(minima, maxima + 2)
+    previousMinimum = nextMinimum - 1
+    hasBoundaries = (previousMinimum >= 0) & (nextMinimum < minima.size)
+    maxima, leftBoundary, rightBoundary = maxima[hasBoundaries], minima[previousMinimum[hasBoundaries]], minima[nextMinimum[hasBoundaries]]
+    left = maxima - leftBoundary
+    right = rightBoundary - maxima - 1
+    search = np.minimum(np.minimum(int(peakMaximum/2) - 1, maxima - 1), size - 2 - maxima)
+    valid = (left <= search) & (right <= search) & (left + right > peakMinimum)
+    maxima, leftBoundary, rightBoundary, left, right = maxima[valid], leftBoundary[valid], rightBoundary[valid], left[valid], right[valid]
+    if (maxima.size == 0):
+        return peakTable.empty(size)
+
+    #Derivative on the left (leftBoundary to maximum - 1) and on the right (maximum + 1 to rightBoundary - 1) of each peak, one peak per row
+    offsets = np.arange(max(left.max(), right.max()))
+    leftWindow = np.where(offsets < left[:, np.newaxis], signalPrime[np.minimum(leftBoundary[:, np.newaxis] + offsets, size - 1)], -np.inf)
+    rightWindow = np.where(offsets < right[:, np.newaxis], signalPrime[np.minimum(maxima[:, np.newaxis] + 1 + offsets, size - 1)], np.inf)
+    leftArgmax = leftWindow.argmax(axis = 1)
+    rightArgmin = rightWindow.argmin(axis = 1)
+    rows = np.arange(maxima.size)
+    accepted = (leftWindow[rows, leftArgmax] > derivativeThreshold) & (rightWindow[rows, rightArgmin] < - derivativeThreshold)
+    fwhm = np.trunc((left - leftArgmax) * np.sqrt(2 * np.log(2))) + np.trunc(rightArgmin * np.sqrt(2 * np.log(2)))
+
+    #The zero of the derivative between the two channels of the maximum
+    centroid = maxima + signalPrime[maxima] / (signalPrime[maxima] - signalPrime[maxima + 1])
+    return peakTable.fromRegions(leftBoundary[accepted], rightBoundary[accepted], centroid[accepted], fwhm[accepted], size)
+
+def regionChannels(start, end):
+    """
+    Returns the channels of all the regions start[k] to end[k] (both included), region after region.
+    """
+    lengths = end - start + 1
+    offsets = np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return np.arange(lengths.sum()) - offsets + np.repeat(start, lengths)
+
+class peakTable:
+    """
+    Compact table of the peak regions of a spectrum: one row per region with the first and last channels (start and end, both included), the centroid (channel of the zero of the derivative at the maximum) and the FWHM. The regions are sorted and do not overlap: when two peaks share a boundary channel, it belongs to the later one, as in the FWHM array of findPeaks. Only the channels inside the regions are clipped by SASNIP.
+
+    Parameters
+    ----------
+    regions : numpy.ndarray
+        Structured array with the fields of peakTable.dtype.
+    size : int
+        The number of channels of the spectrum.
+    """
+    dtype = np.dtype([("start", np.int64), ("end", np.int64), ("centroid", float), ("fwhm", float)])
+
+    def __init__(self, regions, size):
+        self.regions = regions
+        self.size = size
+
+    @classmethod
+    def empty(cls, size):
+        return cls(np.zeros(0, dtype = cls.dtype), size)
+
+    @classmethod
+    def fromRegions(cls, start, end, centroid, fwhm, size):
+        #Regions are given in the order of their maxima; a later region takes the channels it shares with the previous one
+        end = end.copy()
+        end[:-1] = np.minimum(end[:-1], start[1:] - 1)
+        kept = end >= start
+        regions = np.zeros(np.count_nonzero(kept), dtype = cls.dtype)
+        regions["start"], regions["end"], regions["centroid"], regions["fwhm"] = start[kept], end[kept], centroid[kept], fwhm[kept]
+        return cls(regions, size)
+
+    def __len__(self):
+        return self.regions.size
+
+    def __getitem__(self, index):
+        return self.regions[index]
+
+    def __iter__(self):
+        return iter(self.regions)
+
+    @property
+    def start(self):
+        return self.regions["start"]
+
+    @property
+    def end(self):
+        return self.regions["end"]
+
+    @property
+    def centroid(self):
+        return self.regions["centroid"]
+
+    @property
+    def fwhm(self):
+        return self.regions["fwhm"]
+
+    def at(self, channel):
+        """
+        Returns the index of the region that contains the channel, or -1.
+        """
+        index = np.searchsorted(self.start, channel, side = 'right') - 1
+        if (index >= 0 and channel <= self.end[index]):
+            return int(index)
+        return -1
+
+    def between(self, low, high):
+        """
+        Returns the regions with at least one channel between low and high (both included).
+        """
+        return self.regions[(self.end >= low) & (self.start <= high)]
+
+    def channels(self):
+        """
+        Returns the channels inside the regions and the FWHM of the region of each one.
+        """
+        lengths = self.end - self.start + 1
+        return regionChannels(self.start, self.end), np.repeat(self.fwhm, lengths)
+
+    def fwhmArray(self):
+        """
+        Returns the FWHM array of findPeaks: the FWHM of the region in each channel of a region and 0 elsewhere.
+        """
+        fwhmArray = np.zeros(self.size)
+        channels, fwhm = self.channels()
+        fwhmArray[channels] = fwhm
+        return fwhmArray
+
+def stopCondition(background, tolerance, fwhmArray, signalSum, previousB):
+    """
+    This function evaluates if the desired background has been estimated according with the tolerance given.
+
+    Parameters
+    ----------
+    background : numpy.ndarray
+        The background of the spectrum estimated so far. A 2-D array holds one spectrum per row and every row is evaluated on its own.
+    tolerance : float
+        The value whose evaluation should be inferior to.
+    fwhmArray : numpy.ndarray
+        Array containing the values of the FWHM in the base width regions of the peak. Used to identify the regions of peaks and regions of no-peaks.
+    signalSum : int or numpy.ndarray
+        The total sum of counts of the original spectrum (one per row for 2-D backgrounds).
+    previousB : float or numpy.ndarray
+        The previous value of parameter B whose new calculated B will be compared to.
+
+    Returns
+    -------
+    (percentage > tolerance) : bool or numpy.ndarray
+        If true, the SASNIP algorithm will continue, if false, it will stop.
+    parameterB : float or numpy.ndarray
+        The value of the new parameter B calculated in the function.
+    """    
+    #The cumulative sums add the channels one by one, in the same order of a plain loop
+    peakRegion = (fwhmArray != 1) & (fwhmArray != 0)
+    yin = np.cumsum(np.where(peakRegion, background, 0), axis = -1)[..., -1]
+    yout = np.cumsum(np.where(peakRegion, 0, background), axis = -1)[..., -1]
+
+    omega = (yin + yout) / signalSum
+    parameterB =  yin * omega + yout * (1 - omega)
+    percentage = abs(parameterB - previousB)/previousB
+    
+    return (percentage > tolerance), parameterB
+
+def clipSignal(paddedSignal, padding, channels, r, windows):
+    """
+    This function executes one clipping sweep of the SASNIP algorithm over the given windows. For each window i only the channels whose clipping width is at least i are visited: such a channel is clipped to the mean of its neighbours at distance i if that mean is lower. All the visited channels are clipped at once, from the values of the previous window, and the buffers are allocated once per sweep. The left padding of each spectrum is refilled, for every window, with its last channels (the neighbour of a channel below i is taken from the end of the spectrum, as the negative indexes of the original loop did) and the right padding holds infinity, which leaves the channels closer than i to the end of the spectrum unchanged.
+
+    Parameters
+    ----------
+    paddedSignal : numpy.ndarray
+        C-contiguous 2-D array with one LLS transformed spectrum per row and `padding` channels on each side. The right padding must be filled with infinity. The central region is replaced by the clipped spectra.
+    padding : int
+        The number of padded channels on each side of the spectra. Windows equal to or larger than the number of channels leave the spectra unchanged, so it never needs to be larger than the number of channels minus one.
+    channels : numpy.ndarray
+        The positions in the flattened paddedSignal of the channels that can be clipped, sorted by decreasing clipping width.
+    r : numpy.ndarray
+        The clipping width of each of the channels.
+    windows : iterable of int
+        The clipping windows, in the order they are applied.
+
+    Returns
+    -------
+    clippedSignal : numpy.ndarray
+        View of the central region of paddedSignal, i.e. the clipped spectra.
+    """
+    size = paddedSignal.shape[-1] - 2 * padding
+    clippedSignal = paddedSignal[..., padding: padding + size]
+    flatSignal = paddedSignal.reshape(-1)
+    #The neighbours at distance i are gathered with the same indexes from views shifted by i, so no index is computed per window
+    offsets = channels - padding
+    negativeR = -r
+    average = np.empty(channels.size)
+    other = np.empty(channels.size)
+    current = np.empty(channels.size)
+    clip = np.empty(channels.size, dtype = bool)
+
+    for i in windows:
+        if (i >= size):
+            continue
+        count = np.searchsorted(negativeR, -i, side = 'right')
+        if (count == 0):
+            continue
+        paddedSignal[..., padding - i: padding] = clippedSignal[..., size - i:]
+        active = channels[:count]
+        np.take(flatSignal[padding - i:], offsets[:count], out = average[:count])
+        np.take(flatSignal[padding + i:], offsets[:count], out = other[:count])
+        np.add(average[:count], other[:count], out = average[:count])
+        average[:count] /= 2
+        np.take(flatSignal, active, out = current[:count])
+        np.less(average[:count], current[:count], out = clip[:count])
+        np.copyto(current[:count], average[:count], where = clip[:count])
+        flatSignal[active] = current[:count]
+
+    return clippedSignal
+
+def sasnip(signal, t = 1, tolerance = 0.005, decrease = True, peakMinimum = 4, peakMaximum = 100, derivativeThreshold = 0, smooth = True, maxIterations = None, diagnostics = None):
+    """
+    This function executes the SASNIP algorithm and calls all the functions needed to do so.
+
+    Parameters
+    ----------
+    signal : array-like
+        The values of the measured data, i.e. the spectrum itself.
+    t : int, optional
+        A scalar that can be multiplied to the array of the FWHM of the peaks. The default value is recommended.
+    tolerance : float, optional
+        The value whose evaluation made in the stopCondition function should be inferior to. The default value is recommended.
+    decrease : bool, optional
+        This variable determines whether the background estimation in a point starts in the closest or in the furthest neighbours. To a better understanding, read [2].
+    peakMinimum : int, optional
+        The minimum base width (not FWHM) that a peak must have. Called in the findPeaks function.
+    peakMaximum : int, optional
+        The maximum base width (not FWHM) that a peak must have. Called in the findPeaks function.
+    derivativeThreshold : float, optional
+        The value that the derivative must cross (both in the positive and negative sides of the derivative of the peak) in order to consider a certain region as a valid peak. Called in the findPeaks function. (Warning: this parameter may impact greatly the results)
+    smooth : bool, optional
+        If true, an initial smooth will be applied to the raw signal. If false, the smooth will only be applied in the functions that need it to obtain better results (example: findPeaks function).
+    maxIterations : int, optional
+        The largest number of clipping sweeps (outer iterations). The background of the last sweep is returned if the stop condition is not satisfied by then. There is no limit by default.
+    diagnostics : diagnostics.backgroundDiagnostics, optional
+        If given, the time of each stage, the iterations and the convergence of the stop condition, the largest clipping window and the number of peak regions are recorded in it.
+
+    Returns
+    -------
+    background : np.ndarray
+        Array with the final background estimated for the input signal.
+    
+    References
+    ----------
+    .. [1] R. Shi, X. Tuo, H. Zheng et al., “Step-approximation SNIP background-elimination algorithm for HPGe gamma spectra,” Nuclear Instruments and Methods in Physics Research Section A: Accelerators, Spectrometers, Detectors and Associated Equipment, vol. 885, pp. 60-66, 2018.
+    .. [2] M. Morháč and V. Matoušek, “Peak clipping algorithms for background estimation in spectroscopic data,” Applied spectroscopy, vol. 62, no. 1, pp. 91-106, 2008.
+    """   
+    return batchSasnip(np.reshape(signal, (1, -1)), t, tolerance, decrease, peakMinimum, peakMaximum, derivativeThreshold, smooth, maxIterations, diagnostics)[0]
+
+def batchSasnip(signals, t = 1, tolerance = 0.005, decrease = True, peakMinimum = 4, peakMaximum = 100, derivativeThreshold = 0, smooth = True, maxIterations = None, diagnostics = None):
+    """
+    This function executes the SASNIP algorithm over several spectra with the same number of channels at once. Every spectrum keeps its own FWHM array and its own stop condition: the clipping sweeps are applied to all the spectra that have not converged yet with the same array operations, and a spectrum is removed from the sweeps as soon as it converges. Each row of the result is equal to the background given by the sasnip function for that row.
+
+    Parameters
+    ----------
+    signals : array-like
+        2-D array with one spectrum per row.
+    t : int, optional
+        A scalar that can be multiplied to the array of the FWHM of the peaks. The default value is recommended.
+    tolerance : float, optional
+        The value whose evaluation made in the stopCondition function should be inferior to. The default value is recommended.
+    decrease : bool, optional
+        This variable determines whether the background estimation in a point starts in the closest or in the furthest neighbours.
+    peakMinimum : int, optional
+        The minimum base width (not FWHM) that a peak must have. Called in the findPeaks function.
+    peakMaximum : int, optional
+        The maximum base width (not FWHM) that a peak must have. Called in the findPeaks function.
+    derivativeThreshold : float, optional
+        The value that the derivative must cross in order to consider a certain region as a valid peak. Called in the findPeaks function.
+    smooth : bool, optional
+        If true, an initial smooth will be applied to the raw signals.
+    maxIterations : int, optional
+        The largest number of clipping sweeps of each spectrum.
+    diagnostics : diagnostics.backgroundDiagnostics, optional
+        If given, the stages, iterations and convergence of every spectrum are recorded in it.
+
+    Returns
+    -------
+    backgrounds : np.ndarray
+        2-D array with the final background estimated for each row of signals.
+    """
+    signals = np.asarray(signals)
+    if (signals.ndim != 2):
+        raise ValueError("signals must be a 2-D array with one spectrum per row")
+    if (signals.shape[0] == 0 or signals.shape[1] == 0):
+        return np.empty(signals.shape)
+
+    with timed(diagnostics, "smoothing"):
+        smoothedSignals = smoothSignal(signals)
+    with timed(diagnostics, "derivative"):
+        signalsPrime = firstDerivative(smoothedSignals)
+    with timed(diagnostics, "peaks"):
+        tables = [derivativePeakTable(signalPrime, peakMinimum, peakMaximum, derivativeThreshold) for signalPrime in signalsPrime]
+    signalSum = np.array([signal.sum() for signal in signals])
+    if smooth:
+        signals = smoothedSignals
+    with timed(diagnostics, "lls"):
+        llsSignals = llsTransform(signals)
+    with timed(diagnostics, "clipping"):
+        return clipBackground(llsSignals, tables, signalSum, t, tolerance, decrease, maxIterations, diagnostics)
+
+def llsTransform(signal):
+    """
+    This function applies the LLS (log-log-square root) operator to the signal, which compresses its dynamic range before the clipping.
+    """
+    return np.log(np.log(np.sqrt(signal + 1) + 1) + 1)
+
+#Largest size in bytes of a block of padded spectra clipped together by clipBackground, so that the gathers of the clipping sweeps stay in the processor cache
+blockBytes = 1 << 19
+
+def clipBackground(llsSignal, tables, signalSum, t = 1, tolerance = 0.005, decrease = True, maxIterations = None, diagnostics = None):
+    """
+    This function executes the clipping stage of the SASNIP algorithm: clipping sweeps over the LLS transformed spectra are repeated until the stop condition of each spectrum is satisfied, and the converged spectra are removed from the sweeps. A spectrum also stops when a sweep leaves all its channels unchanged, since every following sweep would repeat the same one, or when it reaches maxIterations sweeps. The spectra are clipped in blocks of consecutive rows of at most blockBytes (at least one spectrum per block), one block after the other, so that the channels gathered by each sweep are close to each other in memory.
+
+    Parameters
+    ----------
+    llsSignal : numpy.ndarray
+        2-D array with one LLS transformed spectrum per row.
+    tables : list of peakTable
+        The peak regions of each spectrum.
+    signalSum : numpy.ndarray
+        The total sum of counts of each original spectrum.
+    t : int, optional
+        A scalar that can be multiplied to the array of the FWHM of the peaks.
+    tolerance : float, optional
+        The value whose evaluation made in the stopCondition function should be inferior to.
+    decrease : bool, optional
+        This variable determines whether the background estimation in a point starts in the closest or in the furthest neighbours.
+    maxIterations : int, optional
+        The largest number of sweeps of each spectrum (no limit by default).
+    diagnostics : diagnostics.backgroundDiagnostics, optional
+        If given, the largest clipping window and the number of peak regions of each spectrum, its parameter B after every iteration and the reason it stopped are recorded in it.
+
+    Returns
+    -------
+    backgrounds : np.ndarray
+        2-D array with the final background estimated for each spectrum.
+    """
+    if maxIterations is not None and maxIterations < 1:
+        raise ValueError("maxIterations must be at least 1")
+    size = llsSignal.shape[1]
+    backgrounds = np.empty(llsSignal.shape)
+    #The FWHM arrays are only used by the stop condition; the clipping visits the channels of the peak regions
+    fwhm = np.array([table.fwhmArray() for table in tables]).reshape(llsSignal.shape)
+    m = (t * fwhm).max(axis = 1, initial = 0).astype(int)
+    if diagnostics is not None:
+        diagnostics.startClipping(m, [len(table) for table in tables])
+    blockRows = max(blockBytes // (8 * (size + 2 * max(min(m.max(initial = 0), size - 1), 0))), 1)
+    for start in range(0, llsSignal.shape[0], blockRows):
+        rows = np.arange(start, min(start + blockRows, llsSignal.shape[0]))
+        backgrounds[rows] = clipRows(llsSignal[rows], [tables[row] for row in rows], rows, fwhm[rows], m[rows], signalSum[rows], t, tolerance, decrease, maxIterations, diagnostics)
+    return backgrounds
+
+def clipRows(llsSignal, tables, rows, fwhm, m, signalSum, t, tolerance, decrease, maxIterations, diagnostics):
+    #The clipping of one block of clipBackground; rows are the rows of the block in the diagnostics
+    size = llsSignal.shape[1]
+    padding = max(min(m.max(), size - 1), 0)
+    paddedSignal = np.pad(llsSignal.astype(float), ((0, 0), (padding, padding)), mode = 'constant', constant_values = np.inf)
+
+    #Windows larger than the largest clipping width of a spectrum leave it unchanged, so all the spectra share the same windows
+    if decrease:
+        windows = range(m.max(), 0, -1)
+    else:
+        windows = range(1, m.max() + 1)
+
+    #Without clipping windows the baseline of a spectrum is never filled, as in the original loop
+    unclipped = (m < 1)
+    parameterB = np.ones(llsSignal.shape[0])
+    backgrounds = np.empty(llsSignal.shape)
+    #The converged spectra stay in paddedSignal, but their channels are removed from the sweeps
+    active = np.arange(llsSignal.shape[0])
+    channels, r, channelRows = clippingChannels(tables, t, padding, paddedSignal.shape[1])
+    previousBaseline = llsSignal
+    iteration = 0
+
+    while (active.size):
+        clipSignal(paddedSignal, padding, channels, r, windows)
+        baseline = paddedSignal[active, padding: padding + size]
+        baseline[unclipped] = 0
+        iteration += 1
+        #An unchanged spectrum is a fixed point of the sweep: its background and its parameter B would not change any more
+        changed = (baseline != previousBaseline).any(axis = 1)
+        previousBaseline = baseline
+        background = -1 + (np.exp(np.exp(baseline) - 1) - 1) ** 2
+        continueCondition, parameterB = stopCondition(background, tolerance, fwhm, signalSum, parameterB)
+        converged = ~continueCondition
+        continueCondition &= changed
+        if maxIterations is not None and iteration >= maxIterations:
+            continueCondition[:] = False
+        backgrounds[active] = background
+        if diagnostics is not None:
+            diagnostics.iteration(rows[active], parameterB, np.where(continueCondition, "", np.where(~changed, "unchanged", np.where(converged, "tolerance", "maxIterations"))))
+        if not continueCondition.all():
+            previousBaseline = previousBaseline[continueCondition]
+            fwhm, signalSum, parameterB, unclipped, active = fwhm[continueCondition], signalSum[continueCondition], parameterB[continueCondition], unclipped[continueCondition], active[continueCondition]
+            running = np.zeros(llsSignal.shape[0], dtype = bool)
+            running[active] = True
+            kept = running[channelRows]
+            channels, r, channelRows = channels[kept], r[kept], channelRows[kept]
+
+    return backgrounds
+
+def clippingChannels(tables, t, padding, width):
+    """
+    This function lists the channels of the peak regions that can be clipped (clipping width t * FWHM of at least 1) for the spectra of the given peak tables, as positions in the flattened padded array used by clipSignal, sorted by decreasing clipping width.
+
+    Parameters
+    ----------
+    tables : list of peakTable
+        The peak regions of each spectrum of the padded array, in order.
+    t : int
+        A scalar that can be multiplied to the FWHM of the peaks.
+    padding : int
+        The number of padded channels on each side of the spectra.
+    width : int
+        The number of channels of each padded spectrum.
+
+    Returns
+    -------
+    channels : numpy.ndarray
+        The positions of the channels in the flattened padded array.
+    r : numpy.ndarray
+        The clipping width of each channel.
+    rows : numpy.ndarray
+        The spectrum of each channel.
+    """
+    positions = [np.zeros(0, dtype = np.int64)]
+    widths = [np.zeros(0)]
+    for row, table in enumerate(tables):
+        channels, fwhm = table.channels()
+        r = t * fwhm
+        clipped = r >= 1
+        positions.append(row * width + padding + channels[clipped])
+        widths.append(r[clipped])
+    positions = np.concatenate(positions)
+    widths = np.concatenate(widths)
+    order = np.argsort(-widths, kind = 'stable')
+    return positions[order], widths[order], positions[order] // width
+
+class sasnipPipeline:
+    """
+    The SASNIP algorithm of one spectrum as a sequence of stages: smoothing, first derivative, peak map (peakTable), LLS transform and clipping with the stop condition. The output of every stage is kept together with the parameters it was computed with, and run only recomputes the stages whose parameters (or inputs) changed. Changing decrease, t or tolerance only repeats the clipping; changing the peak constraints repeats the peak map and the clipping, without smoothing or differentiating again.
+
+    Parameters
+    ----------
+    signal : array-like
+        The values of the measured data, i.e. the spectrum itself.
+
+    Attributes
+    ----------
+    recomputed : list of str
+        The stages computed in the last call of run.
+    """
+    def __init__(self, signal):
+        self.signal = np.reshape(signal, -1)
+        self.signalSum = self.signal.sum()
+        self.stages = {}
+        self.recomputed = []
+
+    def stage(self, name, key, function, diagnostics = None):
+        if name not in self.stages or self.stages[name][0] != key:
+            with timed(diagnostics, name):
+                self.stages[name] = (key, function())
+            self.recomputed.append(name)
+        return self.stages[name][1]
+
+    def precompute(self, diagnostics = None):
+        """
+        Computes the stages that do not depend on any parameter (smoothing and first derivative), e.g. before the pipeline is copied to other processes, and returns their outputs.
+        """
+        smoothedSignal = self.stage("smoothing", (), lambda: smoothSignal(self.signal), diagnostics)
+        signalPrime = self.stage("derivative", (), lambda: firstDerivative(smoothedSignal), diagnostics)
+        return smoothedSignal, signalPrime
+
+    def run(self, t = 1, tolerance = 0.005, decrease = True, peakMinimum = 4, peakMaximum = 100, derivativeThreshold = 0, smooth = True, maxIterations = None, diagnostics = None):
+        """
+        Returns the same background as sasnip(signal, t, tolerance, decrease, peakMinimum, peakMaximum, derivativeThreshold, smooth, maxIterations), reusing the stages that do not depend on the parameters that changed. Only the stages computed in this call are recorded in diagnostics.
+        """
+        self.recomputed = []
+        smoothedSignal, signalPrime = self.precompute(diagnostics)
+        peaksKey = (peakMinimum, peakMaximum, derivativeThreshold)
+        table = self.stage("peaks", peaksKey, lambda: derivativePeakTable(signalPrime, peakMinimum, peakMaximum, derivativeThreshold), diagnostics)
+        llsSignal = self.stage("lls", (smooth,), lambda: llsTransform(smoothedSignal if smooth else self.signal), diagnostics)
+        if self.signal.size == 0:
+            return np.empty(0)
+        clippingKey = (t, tolerance, decrease, maxIterations) + peaksKey + (smooth,)
+        return self.stage("clipping", clippingKey, lambda: clipBackground(llsSignal.reshape(1, -1), [table], np.array([self.signalSum]), t, tolerance, decrease, maxIterations, diagnostics)[0], diagnostics)
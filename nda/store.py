@@ -0,0 +1,134 @@
+import struct
+import numpy as np
+from .background import estimate_batch_background
+
+#Magic, version, dtype, number of channels and number of spectra, padded to headerSize bytes
+headerFormat = "<8sI8sQQ"
+headerSize = 64
+magic = b"NDASTORE"
+version = 1
+
+class spectrumStore:
+    """
+    On-disk store of spectra with the same number of channels: a fixed-size header followed by a contiguous (spectra, channels) array, memory-mapped on access. Rows are read lazily (indexing returns views of the memory map, slices included) and new spectra are appended at the end of the file, so stores larger than the available memory can be built and read.
+
+    Parameters
+    ----------
+    path : str
+        The path of an existing store (see spectrumStore.create for new ones).
+    mode : {'r', 'r+'}, optional
+        Read-only or read-write access. Appending and writing rows needs 'r+'.
+    """
+    def __init__(self, path, mode = 'r'):
+        if mode not in ('r', 'r+'):
+            raise ValueError("mode must be 'r' or 'r+'")
+        self.path = path
+        self.mode = mode
+        with open(path, "rb") as storeFile:
+            header = storeFile.read(headerSize)
+        if len(header) != headerSize or header[:len(magic)] != magic:
+            raise ValueError("%s is not a spectrum store" % path)
+        _, fileVersion, dtype, self.channels, self.spectra = struct.unpack_from(headerFormat, header)
+        if fileVersion != version:
+            raise ValueError("unsupported spectrum store version %d" % fileVersion)
+        self.dtype = np.dtype(dtype.rstrip(b"\0").decode())
+        self.map()
+
+    @classmethod
+    def create(cls, path, channels, spectra = 0, dtype = np.float64):
+        """
+        Creates a store for spectra with the given number of channels, with room for `spectra` zero-filled rows, and opens it for reading and writing.
+        """
+        dtype = np.dtype(dtype).newbyteorder('<')
+        with open(path, "wb") as storeFile:
+            storeFile.write(struct.pack(headerFormat, magic, version, dtype.str.encode(), channels, spectra).ljust(headerSize, b"\0"))
+            storeFile.truncate(headerSize + spectra * channels * dtype.itemsize)
+        return cls(path, 'r+')
+
+    def map(self):
+        if self.spectra == 0 or self.channels == 0:
+            self.data = np.empty((self.spectra, self.channels), dtype = self.dtype)
+        else:
+            self.data = np.memmap(self.path, dtype = self.dtype, mode = self.mode, offset = headerSize, shape = (self.spectra, self.channels))
+
+    def __len__(self):
+        return self.spectra
+
+    @property
+    def shape(self):
+        return (self.spectra, self.channels)
+
+    def __getitem__(self, index):
+        return self.data[index]
+
+    def __setitem__(self, index, values):
+        self.data[index] = values
+
+    def append(self, spectra):
+        """
+        Appends one spectrum (1-D) or several spectra (2-D, one per row) to the end of the store.
+        """
+        if self.mode != 'r+':
+            raise ValueError("the store was opened read-only")
+        spectra = np.asarray(spectra, dtype = self.dtype)
+        spectra = spectra.reshape(1, -1) if spectra.ndim == 1 else spectra
+        if spectra.shape[1] != self.channels:
+            raise ValueError("the spectra must have %d channels" % self.channels)
+        self.flush()
+        self.data = None
+        with open(self.path, "r+b") as storeFile:
+            storeFile.seek(headerSize + self.spectra * self.channels * self.dtype.itemsize)
+            storeFile.write(np.ascontiguousarray(spectra).tobytes())
+            self.spectra += spectra.shape[0]
+            storeFile.seek(0)
+            storeFile.write(struct.pack(headerFormat, magic, version, self.dtype.str.encode(), self.channels, self.spectra))
+        self.map()
+
+    def chunks(self, chunkSize = 256):
+        """
+        Yields (start, rows) for consecutive blocks of at most chunkSize spectra, without reading the whole store.
+        """
+        for start in range(0, self.spectra, chunkSize):
+            yield start, self.data[start: start + chunkSize]
+
+    def flush(self):
+        if isinstance(self.data, np.memmap):
+            self.data.flush()
+
+    def close(self):
+        self.flush()
+        self.data = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+
+def estimate_store_backgrounds(store, outputPath, method = "sasnip", parameters = None, chunkSize = 256):
+    """
+    Estimates the background of every spectrum of a store, chunkSize spectra at a time, and writes the backgrounds to a new store with the same shape. Only one chunk of spectra and its backgrounds are in memory at any time.
+
+    Parameters
+    ----------
+    store : spectrumStore
+        The spectra.
+    outputPath : str
+        The path of the store of backgrounds (overwritten if it exists).
+    method : {'sasnip', 'snip'}, optional
+        The background estimation method.
+    parameters : dict, optional
+        Keyword arguments of sasnip.sasnip or background.calculate_snip_background.
+    chunkSize : int, optional
+        The number of spectra estimated at once.
+
+    Returns
+    -------
+    backgrounds : spectrumStore
+        The store of backgrounds, open for reading and writing.
+    """
+    backgrounds = spectrumStore.create(outputPath, store.channels, len(store))
+    for start, rows in store.chunks(chunkSize):
+        backgrounds[start: start + rows.shape[0]] = estimate_batch_background(np.asarray(rows, dtype = float), method, parameters or {})[1]
+        backgrounds.flush()
+    return backgrounds
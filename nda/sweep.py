@@ -0,0 +1,146 @@
+import itertools
+from multiprocessing import get_all_start_methods, get_context
+import numpy as np
+from .background import transformed_snip_background
+from .batch import available_cores
+from .sasnip import llsTransform, sasnipPipeline
+
+defaultRanges = {
+    "sasnip": {"peakMaximum": [25, 50, 75, 100, 150, 200], "derivativeThreshold": [0, 1, 2, 5, 10]},
+    "snip": {"mhw": [5, 10, 15, 20, 30, 50], "shw": [0, 1, 2, 3]},
+}
+
+def parameter_grid(ranges):
+    """
+    Returns every combination of the values of ranges, a dictionary with the values of each parameter, as a list of dictionaries.
+    """
+    names = list(ranges)
+    return [dict(zip(names, values)) for values in itertools.product(*(ranges[name] for name in names))]
+
+def random_parameters(ranges, samples, seed = None):
+    """
+    Returns up to `samples` different parameter sets with the value of each parameter drawn at random from its values in ranges.
+    """
+    rng = np.random.default_rng(seed)
+    names = list(ranges)
+    sets = {}
+    #Repeated draws are discarded, so a small grid is not sampled forever
+    for _ in range(10 * samples):
+        if len(sets) == samples:
+            break
+        values = tuple(ranges[name][rng.integers(len(ranges[name]))] for name in names)
+        sets.setdefault(values, dict(zip(names, values)))
+    return list(sets.values())
+
+def score_background(data, background, weights = None):
+    """
+    Scores a background (lower is better) as the weighted sum of three fractions of the total counts of the spectrum:
+
+    - negativity, the counts of the background above the spectrum (the negative part of the spectrum without background), which grows when the background cuts into the peaks;
+    - offset, the median of the spectrum without background times the number of channels, which grows when the background stays below the continuum (most channels of a spectrum are background, so the median residual should be zero);
+    - roughness, the sum of the absolute second differences of the background, which grows when the background follows the noise or the peaks.
+
+    Parameters
+    ----------
+    data : numpy.ndarray
+        The spectrum.
+    background : numpy.ndarray
+        Its estimated background.
+    weights : dict, optional
+        The weights of "negativity", "offset" and "roughness" (1 by default).
+
+    Returns
+    -------
+    score : dict
+        The three components and their weighted sum ("score").
+    """
+    weights = dict({"negativity": 1, "offset": 1, "roughness": 1}, **(weights or {}))
+    total = max(np.abs(data).sum(), 1)
+    residual = data - background
+    components = {
+        "negativity": np.maximum(-residual, 0).sum() / total,
+        "offset": abs(np.median(residual)) * data.size / total if data.size else 0.0,
+        "roughness": np.abs(np.diff(background, 2)).sum() / total,
+    }
+    components = {name: float(value) for name, value in components.items()}
+    components["score"] = sum(weights[name] * components[name] for name in ("negativity", "offset", "roughness"))
+    return components
+
+def prepare(data, method):
+    #The stages shared by every parameter set, computed once and copied to the workers
+    if method == "sasnip":
+        pipeline = sasnipPipeline(data)
+        pipeline.precompute()
+        return pipeline
+    return {True: llsTransform(data), False: data}
+
+def group_key(method, parameters):
+    #Parameter sets with the same key only differ in the clipping, so the pipeline of a worker reuses the peak map and the LLS transform
+    if method == "sasnip":
+        return tuple(sorted((name, value) for name, value in parameters.items() if name in ("peakMinimum", "peakMaximum", "derivativeThreshold", "smooth")))
+    return (parameters.get("lls", True),)
+
+#The sweep is also started from a thread of the GUI, and forking a process with several threads can deadlock the children, so the pool starts clean processes: forked from a server process started without threads where available, spawned elsewhere
+startMethod = "forkserver" if "forkserver" in get_all_start_methods() else "spawn"
+
+worker = {}
+
+def start_worker(data, method, prepared, weights):
+    worker.update(data = data, method = method, prepared = prepared, weights = weights)
+
+def evaluate_group(group):
+    results = []
+    for index, parameters in group:
+        if worker["method"] == "sasnip":
+            background = worker["prepared"].run(**parameters)
+        else:
+            arguments = dict({"decrease": True, "lls": True, "fo": 2}, **parameters)
+            background = transformed_snip_background(worker["prepared"][arguments["lls"] == True], **arguments)
+        results.append((index, score_background(worker["data"], background, worker["weights"])))
+    return results
+
+def sweep(data, method = "sasnip", parameterSets = None, fixed = None, workers = None, weights = None):
+    """
+    Estimates the background of a spectrum with every parameter set and ranks the sets by score_background.
+
+    The parameter-free stages (smoothing and first derivative for SASNIP, the LLS transform for SNIP) are computed once and shared by all the sets. The sets that share the peak map and the LLS transform are evaluated one after the other by the same sasnipPipeline, so only their clipping is repeated, and the groups of sets run in parallel on a pool of processes (started with startMethod, so the sweep can run in a thread).
+
+    Parameters
+    ----------
+    data : array-like
+        The spectrum.
+    method : {'sasnip', 'snip'}, optional
+        The background estimation method.
+    parameterSets : list of dict, optional
+        The parameter sets to evaluate, e.g. from parameter_grid or random_parameters (keyword arguments of sasnip.sasnip or background.calculate_snip_background). By default, the grid of defaultRanges.
+    fixed : dict, optional
+        The parameters common to all the sets (the sets take precedence).
+    workers : int, optional
+        The number of processes (default: available cores). With 1, the sets are evaluated in this process.
+    weights : dict, optional
+        The weights of the score (see score_background).
+
+    Returns
+    -------
+    results : list of dict
+        One dictionary per parameter set, from the best score to the worst, with the complete "parameters" (fixed included), the "score" and its components.
+    """
+    data = np.asarray(data, dtype = float)
+    if parameterSets is None:
+        parameterSets = parameter_grid(defaultRanges[method])
+    parameterSets = [dict(fixed or {}, **parameters) for parameters in parameterSets]
+    groups = {}
+    for index, parameters in enumerate(parameterSets):
+        groups.setdefault(group_key(method, parameters), []).append((index, parameters))
+    prepared = prepare(data, method)
+
+    workers = min(workers or available_cores(), len(groups))
+    if workers <= 1:
+        start_worker(data, method, prepared, weights)
+        scores = [evaluate_group(group) for group in groups.values()]
+    else:
+        with get_context(startMethod).Pool(workers, start_worker, (data, method, prepared, weights)) as pool:
+            scores = list(pool.imap_unordered(evaluate_group, groups.values()))
+
+    results = [dict(score, parameters = parameterSets[index]) for group in scores for index, score in group]
+    return sorted(results, key = lambda result: result["score"])
@@ -1,31 +1,21 @@
 import numpy as np
 from matplotlib import pyplot as plt
 from matplotlib.backends.backend_qtagg import (FigureCanvas, NavigationToolbar2QT as NavigationToolbar)
-from pybaselines.smooth import snip
+from matplotlib.patches import Rectangle
 from PyQt5.QtCore import *
 from PyQt5.QtGui import *
 from PyQt5.QtWidgets import *
 import sys
-from sasnip import sasnip
-
-def calculate_snip_background(data, mhw, shw, decrease = True, lls = True, fo = 2):
-    if lls == True:
-        transformed_data =  np.log(np.log(np.sqrt(data + 1) + 1) + 1)
-        background = snip(transformed_data, max_half_window = mhw, decreasing = decrease, smooth_half_window = shw, filter_order = fo)[0]
-        background = -1 + (np.exp(np.exp(background) - 1) - 1) ** 2
-    else:
-        background = snip(data, max_half_window = mhw, decreasing = decrease, smooth_half_window = shw, filter_order = fo)[0]
-    data_no_bkg = data - background
-    return data_no_bkg, background
-
-def onlyFileName(fileName):
-    stringSize = len(fileName)
-    for i in range(stringSize):
-        if fileName[stringSize - (i + 1)] == '/':
-            dirName = fileName[:stringSize - (i + 1)]
-            fileName = fileName[stringSize - i:]
-            break
-    return fileName, dirName
+import time
+from nda.background import estimate_background, scaled_background
+from nda.cache import backgroundCache
+from nda.decimation import lineDecimator
+from nda.diagnostics import backgroundDiagnostics
+from nda.live import fileFollower, socketSource
+from nda.loader import load_spectrum, only_file_name
+from nda.roi import roiIndex, roiTable
+from nda.sasnip import sasnipPipeline
+from nda.sweep import defaultRanges, sweep
 
 def twoSpinBoxes(labels, layout):
     label1 = QLabel(labels[0])
@@ -46,6 +36,45 @@ def twoSpinBoxes(labels, layout):
     layout.addWidget(spinBox2)
     return spinBox1, spinBox2
 
+class backgroundThread(QThread):
+    computed = pyqtSignal(int, object, object)
+    failed = pyqtSignal(int, str)
+
+    def __init__(self, generation, data, method, parameters, pipeline = None, parent = None):
+        super(backgroundThread, self).__init__(parent)
+        self.generation = generation
+        self.data = data
+        self.method = method
+        self.parameters = parameters
+        self.pipeline = pipeline
+        self.diagnostics = backgroundDiagnostics()
+
+    def run(self):
+        try:
+            data_no_bkg, background = estimate_background(self.data, self.method, self.parameters, self.pipeline, self.diagnostics)
+        except Exception as error:
+            self.failed.emit(self.generation, str(error))
+            return
+        self.computed.emit(self.generation, data_no_bkg, background)
+
+class sweepThread(QThread):
+    ranked = pyqtSignal(object)
+    failed = pyqtSignal(str)
+
+    def __init__(self, data, method, fixed, parent = None):
+        super(sweepThread, self).__init__(parent)
+        self.data = data
+        self.method = method
+        self.fixed = fixed
+
+    def run(self):
+        try:
+            results = sweep(self.data, self.method, fixed = self.fixed)
+        except Exception as error:
+            self.failed.emit(str(error))
+            return
+        self.ranked.emit(results)
+
 class window(QMainWindow):
     def __init__(self, parent = None):
         super(window, self).__init__(parent)
@@ -53,9 +82,29 @@ class window(QMainWindow):
         #Main window setup
         win = QWidget(self)
         self.setGeometry(100, 100, 1280, 720)
-        self.span = []
         self.facecolors = plt.colormaps['winter'](np.linspace(0, 1, 4))
         self.dirName = ""
+        self.data_no_bkg = None
+        self.pipeline = None
+        #Every change of the data or of the parameters creates a new generation; only the newest one is plotted
+        self.generation = 0
+        self.backgroundThread = None
+        self.shownGeneration = 0
+        self.cache = backgroundCache()
+        self.roiIndex = roiIndex()
+        self.rois = roiTable()
+        self.roiNumber = 0
+        #Diagnostics of the estimation of the background shown, None if it came from the cache
+        self.diagnostics = None
+        self.sweepThread = None
+        #Live acquisition: the source of the counts, the last version plotted, the events rejected so far and the last background estimated (data, background)
+        self.liveSource = None
+        self.liveVersion = None
+        self.liveRejected = 0
+        self.liveTime = 0
+        self.liveResult = None
+        #The generation at which the live acquisition started; older estimations are of another spectrum
+        self.liveGeneration = 0
         #self.setStyleSheet("background-color: white;")
 
         #Menu bar setup
@@ -64,6 +113,24 @@ class window(QMainWindow):
         file = menu.addMenu("File")
         open = file.addAction("Open")
         file.addAction("Save")
+        self.sidecarAction = file.addAction("Cache Spectra")
+        self.sidecarAction.setCheckable(True)
+        self.sidecarAction.setToolTip("Keep a .npy copy of each opened spectrum next to the file, read instead of the text file while it is unchanged")
+        #Live menu
+        liveMenu = menu.addMenu("Live")
+        followSpectrum = liveMenu.addAction("Follow Spectrum File")
+        followSpectrum.setToolTip("Plot a spectrum file again every time the acquisition software rewrites it")
+        followEvents = liveMenu.addAction("Follow Event File")
+        followEvents.setToolTip("Add the events (channel and optional counts per line) appended to a file")
+        listen = liveMenu.addAction("Listen on Port")
+        listen.setToolTip("Add the events sent to a local TCP port")
+        stopLive = liveMenu.addAction("Stop")
+        #Background menu
+        backgroundMenu = menu.addMenu("Background")
+        showDiagnostics = backgroundMenu.addAction("Diagnostics")
+        showDiagnostics.setToolTip("Stage times, iterations and convergence of the last background estimation")
+        autoTune = backgroundMenu.addAction("Auto-tune")
+        autoTune.setToolTip("Estimate the background with a grid of parameters and choose among the best scored ones")
 
         #Central widget
         self.setCentralWidget(win)
@@ -83,6 +150,13 @@ class window(QMainWindow):
         self.plot, = self.ax.plot(0, color = self.facecolors[0])
         self.sniplot, = self.ax.plot(0, "--", label = "SNIP", color = self.facecolors[2])
         self.nobkgplot, = self.ax.plot(0, label = "W/o Background", color = self.facecolors[3])
+        #The lines only receive the min/max envelope of the visible channels
+        self.lod = lineDecimator(self.ax)
+        #The ROI span is animated: it is drawn over a copy of the rest of the canvas (blitting) instead of redrawing the whole figure
+        self.span = Rectangle((0, 0), 0, 1, transform = self.ax.get_xaxis_transform(), alpha = 0.5, color = self.facecolors[1], animated = True)
+        self.ax.add_patch(self.span)
+        self.canvasBackground = None
+        self.static_canvas.mpl_connect("draw_event", self.canvasDrawn)
 
         #Configuration of the right part of the central widget
         toolsLayout = QVBoxLayout()
@@ -126,6 +200,24 @@ class window(QMainWindow):
         radioLayout.addWidget(self.snipButton)
         radioLayout.addWidget(self.sasnipButton)
         self.sasnipButton.setChecked(True)
+        #Table of named ROIs
+        roiButtonsLine = QHBoxLayout()
+        countsLayout.addLayout(roiButtonsLine)
+        addROIButton = QPushButton("Add ROI")
+        addROIButton.setFixedWidth(100)
+        roiButtonsLine.addWidget(addROIButton)
+        removeROIButton = QPushButton("Remove ROI")
+        removeROIButton.setFixedWidth(100)
+        roiButtonsLine.addWidget(removeROIButton)
+        self.roiTableWidget = QTableWidget(0, 4)
+        self.roiTableWidget.setFixedWidth(300)
+        self.roiTableWidget.setFixedHeight(150)
+        self.roiTableWidget.setHorizontalHeaderLabels(["Name", "Minimum", "Maximum", "Counts"])
+        self.roiTableWidget.verticalHeader().setVisible(False)
+        self.roiTableWidget.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.roiTableWidget.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.roiTableWidget.horizontalHeader().setStretchLastSection(True)
+        countsLayout.addWidget(self.roiTableWidget)
 
         #Configuration of the SNIP options
         snipLayout = QVBoxLayout()
@@ -177,9 +269,34 @@ class window(QMainWindow):
         self.max.setValue(100)
         self.threshold.setValue(1)
 
+        #Background estimation runs in a thread, a short time after the last parameter change
+        self.progress = QProgressBar()
+        self.progress.setRange(0, 0)
+        self.progress.setFixedWidth(150)
+        self.progress.hide()
+        self.statusBar().addPermanentWidget(self.progress)
+        self.debounce = QTimer(self)
+        self.debounce.setSingleShot(True)
+        self.debounce.setInterval(150)
+        self.debounce.timeout.connect(self.startBackground)
+        #During a live acquisition the counts are read every liveTimer interval and the background is estimated at most once every liveInterval seconds
+        self.liveTimer = QTimer(self)
+        self.liveTimer.setInterval(250)
+        self.liveTimer.timeout.connect(self.updateLive)
+        self.liveInterval = 1.0
+
         #Triggers
         open.triggered.connect(self.openFile)
+        followSpectrum.triggered.connect(lambda: self.followFile(False))
+        followEvents.triggered.connect(lambda: self.followFile(True))
+        listen.triggered.connect(self.listen)
+        stopLive.triggered.connect(self.stopLive)
+        showDiagnostics.triggered.connect(self.showDiagnostics)
+        autoTune.triggered.connect(self.autoTune)
         countsButton.clicked.connect(self.count)
+        addROIButton.clicked.connect(self.addROI)
+        removeROIButton.clicked.connect(self.removeROI)
+        self.originalButton.toggled.connect(self.updateROITable)
         self.countInterval[0].valueChanged.connect(self.updateROI)
         self.countInterval[1].valueChanged.connect(self.updateROI)
         self.mhWindow.valueChanged.connect(self.updateSNIP)
@@ -203,22 +320,17 @@ class window(QMainWindow):
         options = QFileDialog.Options()
         fileName, _ = QFileDialog.getOpenFileNames(self, "Open File", self.dirName, "All Files (*);;Text Files (*.txt);;Data Files (*.dat)", options = options)
         if fileName != []:
-            try:
-                self.data = np.genfromtxt(fileName[0], comments = '$')
-            except ValueError:
-                self.data = np.genfromtxt(fileName[0], comments = '$', skip_footer = 1)
-            self.data = np.reshape(self.data, -1)
-            fileName, self.dirName = onlyFileName(fileName[0])
-            if self.sasnipButton.isChecked():
-                background = sasnip(self.data, peakMaximum = self.max.value(), derivativeThreshold = self.threshold.value(), decrease = self.sacheckBoxes[0].isChecked(), smooth = self.sacheckBoxes[1].isChecked())
-                self.data_no_bkg = self.data - background
-            else:
-                self.data_no_bkg, background = calculate_snip_background(self.data, self.mhWindow.value(), self.smooth.value(), self.checkBoxes[0].isChecked(), self.checkBoxes[1].isChecked())
-            x = range(0, self.data.size)
-            self.plot.set_data(x, self.data)
+            self.closeLiveSource()
+            self.data = load_spectrum(fileName[0], self.sidecarAction.isChecked())
+            self.roiIndex.update(self.data)
+            #The SASNIP stages of the spectrum are kept between parameter changes; only one thread uses them at a time
+            self.pipeline = sasnipPipeline(self.data)
+            fileName, self.dirName = only_file_name(fileName[0])
+            self.data_no_bkg = None
+            self.lod.set_data(self.plot, self.data)
             self.plot.set_label(fileName)
-            self.sniplot.set_data(x, background)
-            self.nobkgplot.set_data(x, self.data_no_bkg)
+            self.lod.set_data(self.sniplot, [])
+            self.lod.set_data(self.nobkgplot, [])
             self.updateROI()
             self.navigation.update()
             self.ax.set_xlim(0, self.data.size)
@@ -229,40 +341,299 @@ class window(QMainWindow):
             self.countInterval[1].setMaximum(self.data.size - 1)
             self.cb.clear()
             self.cb.addItem(fileName)
+            self.updateROITable()
+            self.debounce.stop()
+            self.startBackground()
 
     def count(self):
         if self.cb.count() != 0:
-            area = 0
-            if (self.snipButton.isChecked() or self.sasnipButton.isChecked()):
-                for i in range(self.countInterval[0].value(), self.countInterval[1].value(), 1):
-                    area += self.data_no_bkg[i]
-            else:
-                for i in range(self.countInterval[0].value(), self.countInterval[1].value(), 1):
-                    area += self.data[i]
+            subtracted = self.snipButton.isChecked() or self.sasnipButton.isChecked()
+            if subtracted and not self.roiIndex.hasBackground:
+                return
+            area = self.roiIndex.counts(self.countInterval[0].value(), self.countInterval[1].value(), subtracted)
             self.countsString.setText(str(int(area)))
+
+    def addROI(self):
+        self.roiNumber += 1
+        self.rois.add("ROI %d" % self.roiNumber, self.countInterval[0].value(), self.countInterval[1].value())
+        self.updateROITable()
+
+    def removeROI(self):
+        rows = sorted(set(index.row() for index in self.roiTableWidget.selectedIndexes()), reverse = True)
+        for row in rows:
+            self.rois.remove(self.roiTableWidget.item(row, 0).text())
+        self.updateROITable()
+
+    def updateROITable(self):
+        self.roiTableWidget.setRowCount(len(self.rois))
+        results = None
+        if self.cb.count() != 0 and len(self.rois):
+            subtracted = not self.originalButton.isChecked()
+            if not subtracted or self.roiIndex.hasBackground:
+                results = self.rois.evaluate(self.roiIndex)
+                key = "counts_no_bkg" if subtracted else "counts"
+        for row, (name, low, high) in enumerate(self.rois):
+            text = "" if results is None else "%d \u00b1 %d" % (results[key][row], round(results[key + "Error"][row]))
+            for column, value in enumerate([name, str(low), str(high), text]):
+                self.roiTableWidget.setItem(row, column, QTableWidgetItem(value))
     
+    def backgroundParameters(self):
+        if self.sasnipButton.isChecked():
+            return "sasnip", {"peakMaximum": self.max.value(), "derivativeThreshold": self.threshold.value(), "decrease": self.sacheckBoxes[0].isChecked(), "smooth": self.sacheckBoxes[1].isChecked()}
+        return "snip", {"mhw": self.mhWindow.value(), "shw": self.smooth.value(), "decrease": self.checkBoxes[0].isChecked(), "lls": self.checkBoxes[1].isChecked()}
+
     def updateSNIP(self):
         if self.cb.count() != 0:
-            x = range(0, self.data.size)
-            if self.sasnipButton.isChecked():
-                background = sasnip(self.data, peakMaximum = self.max.value(), derivativeThreshold = self.threshold.value(), decrease = self.sacheckBoxes[0].isChecked(), smooth = self.sacheckBoxes[1].isChecked())
-                self.data_no_bkg = self.data - background
+            self.debounce.start()
+
+    def startBackground(self):
+        self.generation += 1
+        if self.liveSource is not None:
+            #The live timer estimates the background of the newest counts
+            return
+        method, parameters = self.backgroundParameters()
+        cached = self.cache.lookup(self.data, method, parameters)
+        if cached is not None:
+            self.showBackground(self.generation, *cached)
+        #A running estimation can not be interrupted; its result is discarded and a new one starts when it ends
+        elif self.backgroundThread is None:
+            self.launchBackground(method, parameters)
+
+    def launchBackground(self, method, parameters):
+        self.backgroundThread = backgroundThread(self.generation, self.data, method, parameters, self.pipeline, self)
+        self.backgroundThread.computed.connect(self.backgroundComputed)
+        self.backgroundThread.failed.connect(self.backgroundFailed)
+        self.backgroundThread.finished.connect(self.backgroundFinished)
+        self.progress.show()
+        self.backgroundThread.start()
+
+    def backgroundComputed(self, generation, data_no_bkg, background):
+        #Results of superseded generations are still valid for their own parameters
+        thread = self.sender()
+        data_no_bkg, background = self.cache.store(thread.data, thread.method, thread.parameters, (data_no_bkg, background))
+        if self.liveSource is not None:
+            if generation < self.liveGeneration:
+                return
+            self.liveResult = (thread.data, background)
+        self.showBackground(generation, data_no_bkg, background, thread.diagnostics)
+
+    def showBackground(self, generation, data_no_bkg, background, diagnostics = None):
+        if self.liveSource is None and generation != self.generation:
+            return
+        self.diagnostics = diagnostics
+        if diagnostics is not None:
+            message = "Background estimated in %.1f ms" % (1000 * diagnostics.totalTime)
+            if diagnostics.m.size:
+                message += " (%d iterations, m = %d, %d peak regions)" % (diagnostics.iterations[0], diagnostics.m[0], diagnostics.peaks[0])
+            self.statusBar().showMessage(message, 5000)
+        if self.liveSource is not None:
+            #The counts kept growing during the estimation: the background is scaled to the newest ones
+            self.shownGeneration = generation
+            self.showLiveData(self.data)
+            return
+        self.shownGeneration = generation
+        self.data_no_bkg = data_no_bkg
+        self.roiIndex.update(data_no_bkg = data_no_bkg)
+        self.updateROITable()
+        self.lod.set_data(self.sniplot, background)
+        self.lod.set_data(self.nobkgplot, self.data_no_bkg)
+        self.static_canvas.draw_idle()
+
+    def backgroundFailed(self, generation, message):
+        if generation == self.generation:
+            self.statusBar().showMessage("Background estimation failed: " + message, 5000)
+
+    def backgroundFinished(self):
+        thread = self.sender()
+        thread.deleteLater()
+        if thread is not self.backgroundThread:
+            return
+        self.backgroundThread = None
+        if self.liveSource is not None:
+            #The live timer starts the next estimation
+            self.progress.hide()
+        elif thread.generation != self.generation and self.shownGeneration != self.generation:
+            method, parameters = self.backgroundParameters()
+            cached = self.cache.lookup(self.data, method, parameters)
+            if cached is not None:
+                self.showBackground(self.generation, *cached)
+                self.progress.hide()
             else:
-                self.data_no_bkg, background = calculate_snip_background(self.data, self.mhWindow.value(), self.smooth.value(), self.checkBoxes[0].isChecked(), self.checkBoxes[1].isChecked())
-            self.sniplot.set_data(x, background)
-            self.nobkgplot.set_data(x, self.data_no_bkg)
-            self.static_canvas.draw_idle()
+                self.launchBackground(method, parameters)
+        else:
+            self.progress.hide()
 
-    def updateROI(self):
-        if len(self.span):
-            for i in self.span:
-                try:
-                    i.remove()
-                except ValueError:
-                    continue
-        self.span.append(self.ax.axvspan(self.countInterval[0].value(), self.countInterval[1].value(), alpha = 0.5, color = self.facecolors[1]))
+    def showDiagnostics(self):
+        if self.diagnostics is not None:
+            text = self.diagnostics.report()
+        elif self.shownGeneration:
+            text = "The background shown was read from the cache."
+        else:
+            text = "No background has been estimated yet."
+        QMessageBox.information(self, "Diagnostics", text)
+
+    def autoTune(self):
+        if self.cb.count() == 0 or self.sweepThread is not None or not self.data.size:
+            return
+        #The parameters that are not swept keep their current values
+        method, parameters = self.backgroundParameters()
+        fixed = {name: value for name, value in parameters.items() if name not in defaultRanges[method]}
+        self.sweepThread = sweepThread(np.array(self.data), method, fixed, self)
+        self.sweepThread.ranked.connect(self.chooseParameters)
+        self.sweepThread.failed.connect(lambda message: self.statusBar().showMessage("Auto-tune failed: " + message, 5000))
+        self.sweepThread.finished.connect(self.sweepFinished)
+        self.statusBar().showMessage("Auto-tuning the %s parameters..." % method.upper())
+        self.progress.show()
+        self.sweepThread.start()
+
+    def sweepFinished(self):
+        self.sweepThread.deleteLater()
+        self.sweepThread = None
+        if self.backgroundThread is None:
+            self.progress.hide()
+
+    def chooseParameters(self, results):
+        self.statusBar().clearMessage()
+        method = self.sender().method
+        results = results[:10]
+        items = ["%.4f: %s" % (result["score"], ", ".join("%s = %s" % (name, result["parameters"][name]) for name in defaultRanges[method])) for result in results]
+        item, ok = QInputDialog.getItem(self, "Auto-tune", "Parameter sets from the best score (lower is better)", items, 0, False)
+        if not ok:
+            return
+        parameters = results[items.index(item)]["parameters"]
+        if method == "sasnip":
+            self.sasnipButton.setChecked(True)
+            self.max.setValue(parameters["peakMaximum"])
+            self.threshold.setValue(int(parameters["derivativeThreshold"]))
+        else:
+            self.snipButton.setChecked(True)
+            self.mhWindow.setValue(parameters["mhw"])
+            self.smooth.setValue(parameters["shw"])
+
+    def followFile(self, events):
+        fileName, _ = QFileDialog.getOpenFileName(self, "Follow File", self.dirName, "All Files (*);;Text Files (*.txt);;Data Files (*.dat)")
+        if fileName:
+            name, self.dirName = only_file_name(fileName)
+            self.startLive(fileFollower(fileName, events = events), name)
+
+    def listen(self):
+        port, ok = QInputDialog.getInt(self, "Listen on Port", "Port (0 for any free port)", 5555, 0, 65535)
+        if ok:
+            try:
+                source = socketSource(port = port)
+            except OSError as error:
+                self.statusBar().showMessage("Live acquisition failed: " + str(error), 5000)
+                return
+            self.startLive(source, "%s:%d" % source.address)
+
+    def startLive(self, source, name):
+        self.closeLiveSource()
+        self.debounce.stop()
+        self.liveSource = source
+        self.liveVersion = None
+        self.liveRejected = 0
+        self.liveTime = 0
+        self.pipeline = None
+        self.data = np.zeros(0)
+        self.data_no_bkg = None
+        self.roiIndex.update(self.data)
+        self.lod.set_data(self.plot, [])
+        self.plot.set_label(name)
+        self.lod.set_data(self.sniplot, [])
+        self.lod.set_data(self.nobkgplot, [])
+        self.ax.legend()
+        self.cb.clear()
+        self.cb.addItem(name)
+        self.generation += 1
+        self.liveGeneration = self.generation
+        self.liveTimer.start()
+        self.updateLive()
+
+    def updateLive(self):
+        try:
+            self.liveSource.poll()
+        except (OSError, ValueError) as error:
+            self.statusBar().showMessage("Live acquisition: " + str(error), 5000)
+            return
+        if self.liveSource.spectrum.rejected != self.liveRejected:
+            self.liveRejected = self.liveSource.spectrum.rejected
+            self.statusBar().showMessage("Live acquisition: %d events rejected (channel out of range)" % self.liveRejected, 5000)
+        data, version = self.liveSource.spectrum.snapshot()
+        if version != self.liveVersion:
+            self.liveVersion = version
+            self.generation += 1
+            self.showLiveData(data)
+        if self.shownGeneration != self.generation and self.backgroundThread is None and self.data.any() and time.monotonic() - self.liveTime >= self.liveInterval:
+            self.liveTime = time.monotonic()
+            #Every estimation starts from the counts themselves: starting from the previous background would clip it further at every update
+            self.launchBackground(*self.backgroundParameters())
+
+    def showLiveData(self, data):
+        #Only the data of the lines change; the axes are only rescaled when the spectrum grows
+        if data.size != self.data.size:
+            self.ax.set_xlim(0, max(data.size, 1))
+            self.countInterval[0].setMaximum(max(data.size - 1, 0))
+            self.countInterval[1].setMaximum(max(data.size - 1, 0))
+        self.data = data
+        self.roiIndex.update(data)
+        self.lod.set_data(self.plot, data)
+        background = None
+        if self.liveResult is not None:
+            background = scaled_background(self.liveResult[0], self.liveResult[1], data)
+        #The counts without background (Count and the ROI table) are only given by an estimation of these counts; until then the scaled background is only plotted
+        self.data_no_bkg = None
+        if background is None:
+            self.lod.set_data(self.sniplot, [])
+            self.lod.set_data(self.nobkgplot, [])
+        else:
+            if np.array_equal(self.liveResult[0], data):
+                self.data_no_bkg = data - background
+                self.roiIndex.update(data_no_bkg = self.data_no_bkg)
+            self.lod.set_data(self.sniplot, background)
+            self.lod.set_data(self.nobkgplot, data - background)
+        if data.size and data.max() * 1.05 > self.ax.get_ylim()[1]:
+            self.ax.set_ylim(0, data.max() * 1.1)
+        self.updateROITable()
         self.static_canvas.draw_idle()
 
+    def closeLiveSource(self):
+        self.liveTimer.stop()
+        if self.liveSource is not None:
+            self.liveSource.close()
+            self.liveSource = None
+            self.liveResult = None
+
+    def stopLive(self):
+        #The background of the final counts is estimated again from scratch
+        if self.liveSource is not None:
+            self.closeLiveSource()
+            self.pipeline = sasnipPipeline(self.data)
+            self.startBackground()
+
+    def closeEvent(self, event):
+        self.debounce.stop()
+        self.closeLiveSource()
+        if self.sweepThread is not None:
+            self.sweepThread.wait()
+        if self.backgroundThread is not None:
+            self.backgroundThread.wait()
+        super(window, self).closeEvent(event)
+
+    def updateROI(self):
+        self.span.set_x(self.countInterval[0].value())
+        self.span.set_width(self.countInterval[1].value() - self.countInterval[0].value())
+        if self.canvasBackground is None:
+            self.static_canvas.draw_idle()
+            return
+        self.static_canvas.restore_region(self.canvasBackground)
+        self.ax.draw_artist(self.span)
+        self.static_canvas.blit(self.ax.bbox)
+
+    def canvasDrawn(self, event):
+        #Every full redraw leaves out the animated span: the canvas is kept without it and the span is drawn on top
+        self.canvasBackground = self.static_canvas.copy_from_bbox(self.ax.bbox)
+        self.ax.draw_artist(self.span)
+
 if __name__ == '__main__':
     app = QApplication(sys.argv)
     win = window()
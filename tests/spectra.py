@@ -0,0 +1,12 @@
+import numpy as np
+
+def synthetic_spectrum(size, peaks, seed, scale = 1000):
+    """
+    A decaying exponential plus a constant with Gaussian peaks at random positions, sampled with Poisson noise.
+    """
+    rng = np.random.default_rng(seed)
+    x = np.arange(size)
+    expected = scale * np.exp(-x / (size / 3)) + scale / 10
+    for _ in range(peaks):
+        expected += rng.uniform(0.5, 5) * scale * np.exp(-0.5 * ((x - rng.uniform(0, size)) / rng.uniform(2, 8)) ** 2)
+    return rng.poisson(expected).astype(float)
@@ -0,0 +1,14 @@
+import numpy as np
+import pytest
+from spectra import synthetic_spectrum
+from nda import background
+
+pytest.importorskip("pybaselines")
+
+@pytest.mark.parametrize("blockBytes", [background.block_bytes, 1])
+@pytest.mark.parametrize("parameters", [{"mhw": 10, "shw": 1}, {"mhw": 30, "shw": 0, "decrease": False, "fo": 4}, {"mhw": 5, "shw": 2, "lls": False, "fo": 8}])
+def test_batch_snip_matches_single(parameters, blockBytes, monkeypatch):
+    monkeypatch.setattr(background, "block_bytes", blockBytes)
+    data = np.array([synthetic_spectrum(1000, 3 + seed, seed, 10 ** (seed % 4)) for seed in range(5)])
+    expected = np.array([background.calculate_snip_background(spectrum, **parameters)[1] for spectrum in data])
+    np.testing.assert_array_equal(background.calculate_batch_snip_background(data, **parameters)[1], expected)
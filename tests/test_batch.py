@@ -0,0 +1,31 @@
+import os
+import numpy as np
+import pytest
+from spectra import synthetic_spectrum
+from nda.batch import find_files, output_names, run_batch
+
+def test_output_names_keep_directories(tmp_path):
+    files = [str(tmp_path / "a" / "run1.txt"), str(tmp_path / "b" / "run1.txt"), str(tmp_path / "b" / "run2.txt")]
+    assert output_names(files, "out") == [os.path.join("out", "a", "run1_nobkg.txt"), os.path.join("out", "b", "run1_nobkg.txt"), os.path.join("out", "b", "run2_nobkg.txt")]
+    assert output_names(files[1:], "out") == [os.path.join("out", "run1_nobkg.txt"), os.path.join("out", "run2_nobkg.txt")]
+
+def test_output_names_collision(tmp_path):
+    with pytest.raises(ValueError):
+        output_names([str(tmp_path / "run1.txt"), str(tmp_path / "run1.dat")], "out")
+
+def test_find_files_once(tmp_path):
+    np.savetxt(tmp_path / "run1.txt", np.ones(10))
+    assert find_files([str(tmp_path), str(tmp_path / "*.txt")]) == [str(tmp_path / "run1.txt")]
+
+def test_run_batch_same_names(tmp_path):
+    for number, directory in enumerate(["a", "b"]):
+        os.makedirs(tmp_path / directory)
+        np.savetxt(tmp_path / directory / "run1.txt", synthetic_spectrum(500, 3, number))
+    files = [str(tmp_path / "a" / "run1.txt"), str(tmp_path / "b" / "run1.txt")]
+    assert run_batch(files, str(tmp_path / "out"), "sasnip", [(100, 200)], workers = 1) == []
+    for fileName in files:
+        data = np.loadtxt(fileName)
+        directory = os.path.basename(os.path.dirname(fileName))
+        written = np.loadtxt(tmp_path / "out" / directory / "run1_nobkg.txt")
+        assert written.shape == data.shape and not np.array_equal(written, data)
+    assert len(open(tmp_path / "out" / "roi_counts.csv").readlines()) == 3
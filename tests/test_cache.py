@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+from spectra import synthetic_spectrum
+from nda.cache import backgroundCache
+from nda.sasnip import sasnip
+
+def result(value, size = 100):
+    return np.full(size, value), np.full(size, -value)
+
+def test_lru_eviction():
+    #Each result holds two arrays of 100 float64 values
+    cache = backgroundCache(maxBytes = 3 * 1600)
+    spectra = [np.full(10, value) for value in range(4)]
+    for value in range(3):
+        cache.store(spectra[value], "sasnip", {}, result(value))
+    assert cache.statistics()["bytes"] == 3 * 1600
+    #The first one becomes the most recently used, so the second one is evicted
+    assert cache.lookup(spectra[0], "sasnip", {})[0][0] == 0
+    cache.store(spectra[3], "sasnip", {}, result(3))
+    assert cache.lookup(spectra[1], "sasnip", {}) is None
+    assert all(cache.lookup(spectra[value], "sasnip", {}) is not None for value in (0, 2, 3))
+    statistics = cache.statistics()
+    assert statistics["entries"] == 3 and statistics["bytes"] == 3 * 1600
+
+def test_store_same_key_and_too_large():
+    cache = backgroundCache(maxBytes = 2000)
+    data = np.ones(10)
+    cache.store(data, "sasnip", {}, result(1))
+    cache.store(data, "sasnip", {}, result(2))
+    assert cache.statistics()["bytes"] == 1600 and cache.lookup(data, "sasnip", {})[0][0] == 2
+    #A result larger than the cache is returned but not kept
+    stored = cache.store(np.zeros(10), "sasnip", {}, result(3, 1000))
+    assert stored[0].size == 1000 and cache.lookup(np.zeros(10), "sasnip", {}) is None
+    assert cache.statistics()["entries"] == 1
+
+def test_statistics():
+    cache = backgroundCache()
+    data = np.ones(10)
+    assert cache.lookup(data, "sasnip", {}) is None
+    cache.store(data, "sasnip", {}, result(1))
+    cache.lookup(data, "sasnip", {})
+    cache.lookup(data, "sasnip", {})
+    statistics = cache.statistics()
+    assert (statistics["hits"], statistics["misses"], statistics["hitRate"]) == (2, 1, pytest.approx(2 / 3))
+    cache.clear()
+    assert cache.statistics()["entries"] == 0 and cache.statistics()["bytes"] == 0
+
+def test_defaults_give_the_same_key():
+    cache = backgroundCache()
+    data = np.ones(10)
+    assert cache.key(data, "sasnip", {}) == cache.key(data, "sasnip", {"t": 1, "tolerance": 0.005, "decrease": True})
+    assert cache.key(data, "sasnip", {}) != cache.key(data, "sasnip", {"tolerance": 0.01})
+    assert cache.key(data, "snip", {"mhw": 10, "shw": 1}) == cache.key(data, "snip", {"mhw": 10, "shw": 1, "decrease": True, "lls": True})
+    assert cache.key(data, "snip", {"mhw": 10, "shw": 1}) != cache.key(data, "snip", {"mhw": 10, "shw": 2})
+    #The contents of the spectrum are part of the key, not the array object
+    assert cache.key(data, "sasnip", {}) == cache.key(data.copy(), "sasnip", {})
+    assert cache.key(data, "sasnip", {}) != cache.key(data * 2, "sasnip", {})
+
+def test_estimate():
+    cache = backgroundCache()
+    data = synthetic_spectrum(500, 3, 0)
+    data_no_bkg, background = cache.estimate(data, "sasnip", {"peakMaximum": 50})
+    np.testing.assert_array_equal(background, sasnip(data, peakMaximum = 50))
+    np.testing.assert_array_equal(data_no_bkg, data - background)
+    assert not background.flags.writeable
+    assert cache.estimate(data, "sasnip", {"peakMaximum": 50})[1] is background
+    assert cache.statistics()["hits"] == 1
@@ -0,0 +1,29 @@
+import numpy as np
+import pytest
+from nda.decimation import minmax_envelope
+
+@pytest.mark.parametrize("low, high, pixels", [(0, 10007, 300), (123, 9000, 97), (0, 1000, 333), (5000, 10007, 1), (-20, 20000, 640)])
+def test_envelope_keeps_bin_extremes(low, high, pixels):
+    data = np.random.default_rng(0).poisson(100, 10007).astype(float)
+    x, y = minmax_envelope(data, low, high, pixels)
+    low, high = max(low, 0), min(high, data.size)
+    #Bins of ceil((high - low) / pixels) channels; the last one may be shorter
+    width = -(-(high - low) // pixels)
+    starts = range(low, high, width)
+    assert x.size == 2 * len(starts) <= 2 * pixels
+    np.testing.assert_array_equal(y, data[x])
+    assert (np.diff(x) >= 0).all()
+    for number, start in enumerate(starts):
+        values = data[start: min(start + width, high)]
+        pair = x[2 * number: 2 * number + 2]
+        assert start <= pair[0] <= pair[1] < start + values.size
+        assert sorted(pair) == sorted([start + values.argmin(), start + values.argmax()])
+    assert y.min() == data[low:high].min() and y.max() == data[low:high].max()
+
+@pytest.mark.parametrize("low, high, pixels", [(0, 100, 50), (0, 100, 80), (10, 30, 10), (-5, 8, 100), (40, 20, 10)])
+def test_narrow_ranges_unchanged(low, high, pixels):
+    data = np.arange(100.0) ** 2
+    x, y = minmax_envelope(data, low, high, pixels)
+    channels = np.arange(max(low, 0), max(min(high, 100), max(low, 0)))
+    np.testing.assert_array_equal(x, channels)
+    np.testing.assert_array_equal(y, data[channels])
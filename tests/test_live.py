@@ -0,0 +1,82 @@
+import os
+import time
+import numpy as np
+from nda.live import eventStream, fileFollower, liveSpectrum, parse_events, send_events, socketSource
+
+def test_add_grows_and_rejects():
+    spectrum = liveSpectrum(4, maxChannels = 10)
+    spectrum.add([1, 1, 6])
+    spectrum.add([2, 3], [5, 0.5])
+    np.testing.assert_array_equal(spectrum.counts, [0, 2, 5, 0.5, 0, 0, 1])
+    version = spectrum.version
+    #A corrupted channel does not grow the spectrum
+    spectrum.add([-1, np.nan, np.inf, 10, 1e9])
+    assert spectrum.counts.size == 7 and spectrum.rejected == 5 and spectrum.version == version
+    spectrum.add([9, 1e9])
+    assert spectrum.counts.size == 10 and spectrum.counts[9] == 1 and spectrum.rejected == 6
+
+def test_parse_events():
+    channels, counts = parse_events("$events\n1\n 2 \n\n3 $ last\n")
+    np.testing.assert_array_equal(channels, [1, 2, 3])
+    assert counts is None
+    channels, counts = parse_events("1 5\n2\n3 0.5\n")
+    np.testing.assert_array_equal(channels, [1, 2, 3])
+    np.testing.assert_array_equal(counts, [5, 1, 0.5])
+
+def test_event_stream_partial_lines():
+    spectrum = liveSpectrum()
+    stream = eventStream(spectrum)
+    stream.feed("1\n2")
+    np.testing.assert_array_equal(spectrum.counts, [0, 1])
+    #The rest of the line completes the pending "2": 4 counts in channel 20
+    stream.feed("0 4\n3")
+    assert spectrum.counts.size == 21 and spectrum.counts[20] == 4 and spectrum.counts.sum() == 5
+    stream.flush()
+    assert spectrum.counts[3] == 1 and stream.pending == ""
+
+def test_file_follower_events(tmp_path):
+    path = tmp_path / "events.txt"
+    path.write_text("")
+    follower = fileFollower(str(path), events = True)
+    assert follower.poll() and follower.spectrum.counts.size == 0
+    with open(path, "a") as events:
+        events.write("1\n2 5\n3")
+    assert follower.poll()
+    np.testing.assert_array_equal(follower.spectrum.counts, [0, 1, 5])
+    assert not follower.poll()
+    with open(path, "a") as events:
+        events.write("\n3\n")
+    assert follower.poll()
+    np.testing.assert_array_equal(follower.spectrum.counts, [0, 1, 5, 2])
+    #A shorter file is a new acquisition
+    path.write_text("0\n")
+    assert follower.poll()
+    np.testing.assert_array_equal(follower.spectrum.counts, [1, 0, 0, 0])
+
+def test_file_follower_spectrum(tmp_path):
+    path = tmp_path / "spectrum.txt"
+    np.savetxt(path, [1.0, 2.0, 3.0])
+    follower = fileFollower(str(path))
+    assert follower.poll() and not follower.poll()
+    np.testing.assert_array_equal(follower.spectrum.counts, [1, 2, 3])
+    #A file still being written (fewer channels) is read again at the next poll
+    path.write_text("4\n")
+    assert not follower.poll()
+    np.savetxt(path, [4.0, 5.0, 6.0])
+    status = os.stat(path)
+    os.utime(path, ns = (status.st_atime_ns, status.st_mtime_ns + 1000000000))
+    assert follower.poll()
+    np.testing.assert_array_equal(follower.spectrum.counts, [4, 5, 6])
+
+def test_socket_source():
+    source = socketSource(liveSpectrum(8))
+    try:
+        send_events(source.address, [1, 2, 2])
+        send_events(source.address, [7, 100000], [3, 1])
+        deadline = time.monotonic() + 5
+        while source.spectrum.counts.sum() < 6 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        np.testing.assert_array_equal(source.spectrum.counts, [0, 1, 2, 0, 0, 0, 0, 3])
+        assert source.spectrum.rejected == 1 and not source.poll()
+    finally:
+        source.close()
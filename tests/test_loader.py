@@ -0,0 +1,69 @@
+import os
+import warnings
+import numpy as np
+import pytest
+from nda.loader import load_spectrum, parse_spectrum, read_sidecar, sidecar_name
+
+def genfromtxt_reference(fileName):
+    #How window.openFile read the spectrum files before parse_spectrum
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        try:
+            data = np.genfromtxt(fileName, comments = '$')
+        except ValueError:
+            data = np.genfromtxt(fileName, comments = '$', skip_footer = 1)
+    return np.reshape(data, -1)
+
+texts = {
+    "single column": "1\n2\n3.5\n\n4e2\n",
+    "comments": "$SPEC_ID:\n$sample 1\n$DATA:\n5 $ first counts\n6\n  7\n8 $\n",
+    "header with footer": "$DATA:\nsample 1\n0 3\n5\n",
+    "no final newline": "10\n20\n30",
+    "columns": "1 2 3\n4 5 6\n7 8 9\n",
+    "columns with footer": "1 2 3 4\n5 6 7 8\n9 10 11 12\ntotal 36\n",
+    "not numbers": "1\nx\n3\n-\n",
+    "columns not numbers": "1 a 3\n4 5 b\n",
+    "empty": "",
+    "only comments": "$SPEC_ID:\n$DATA:\n",
+}
+
+@pytest.mark.parametrize("name", sorted(texts))
+def test_parse_matches_genfromtxt(tmp_path, name):
+    path = tmp_path / "spectrum.txt"
+    path.write_text(texts[name])
+    np.testing.assert_array_equal(parse_spectrum(texts[name]), genfromtxt_reference(str(path)))
+
+@pytest.mark.parametrize("text", ["1 2\n3\n4 5\n6 7\n", "1 2\n3 4\n5\n6\n7\n"])
+def test_inconsistent_columns(tmp_path, text):
+    path = tmp_path / "spectrum.txt"
+    path.write_text(text)
+    with pytest.raises(ValueError):
+        genfromtxt_reference(str(path))
+    with pytest.raises(ValueError):
+        parse_spectrum(text)
+
+def test_sidecar_rewritten_after_change(tmp_path):
+    path = tmp_path / "spectrum.txt"
+    path.write_text("1\n2\n3\n")
+    fileName = str(path)
+    np.testing.assert_array_equal(load_spectrum(fileName, sidecar = True), [1, 2, 3])
+    assert os.path.exists(sidecar_name(fileName))
+    np.testing.assert_array_equal(read_sidecar(fileName), [1, 2, 3])
+    #A different size
+    path.write_text("1\n2\n3\n40\n")
+    assert read_sidecar(fileName) is None
+    np.testing.assert_array_equal(load_spectrum(fileName, sidecar = True), [1, 2, 3, 40])
+    np.testing.assert_array_equal(read_sidecar(fileName), [1, 2, 3, 40])
+    #The same size with a different modification time
+    path.write_text("5\n6\n7\n80\n")
+    status = os.stat(fileName)
+    os.utime(fileName, ns = (status.st_atime_ns, status.st_mtime_ns + 1000000000))
+    assert read_sidecar(fileName) is None
+    np.testing.assert_array_equal(load_spectrum(fileName, sidecar = True), [5, 6, 7, 80])
+    np.testing.assert_array_equal(load_spectrum(fileName, sidecar = True), [5, 6, 7, 80])
+
+def test_sidecar_not_read_without_option(tmp_path):
+    path = tmp_path / "spectrum.txt"
+    path.write_text("1\n2\n")
+    np.testing.assert_array_equal(load_spectrum(str(path)), [1, 2])
+    assert not os.path.exists(sidecar_name(str(path)))
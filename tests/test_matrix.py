@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+from nda.matrix import calculate_matrix_background, estimate_matrix_background, snip_2d
+
+def root_snip_2d(data, m, decreasing = False):
+    #Literal port of the loop of TSpectrum2::Background (successive filtering, second order, no smoothing)
+    working = np.array(data, dtype = float)
+    sizeX, sizeY = working.shape
+    windows = range(m, 0, -1) if decreasing else range(1, m + 1)
+    for i in windows:
+        clipped = working.copy()
+        for x in range(i, sizeX - i):
+            for y in range(i, sizeY - i):
+                a = working[x, y]
+                p1, p2, p3, p4 = working[x - i, y - i], working[x - i, y + i], working[x + i, y - i], working[x + i, y + i]
+                s1, s2, s3, s4 = working[x, y - i], working[x - i, y], working[x + i, y], working[x, y + i]
+                s2 = max(s2, (p1 + p2) / 2)
+                s1 = max(s1, (p1 + p3) / 2)
+                s4 = max(s4, (p2 + p4) / 2)
+                s3 = max(s3, (p3 + p4) / 2)
+                s1 -= (p1 + p3) / 2
+                s2 -= (p1 + p2) / 2
+                s3 -= (p3 + p4) / 2
+                s4 -= (p2 + p4) / 2
+                b = (s1 + s4) / 2 + (s2 + s3) / 2 + (p1 + p2 + p3 + p4) / 4
+                clipped[x, y] = min(a, b)
+        working = clipped
+    return working
+
+def coincidence_matrix(size, seed):
+    #A smooth background with a few 2-D peaks and ridges, sampled with Poisson noise
+    rng = np.random.default_rng(seed)
+    x = np.arange(size)
+    expected = 200 * np.exp(-(x[:, None] + x[None, :]) / size) + 5
+    for _ in range(4):
+        row, column = rng.uniform(0, size, 2)
+        expected += 2000 * np.exp(-((x[:, None] - row) ** 2 + (x[None, :] - column) ** 2) / 8)
+        expected[:, int(column)] += 300
+    return rng.poisson(expected).astype(float)
+
+@pytest.mark.parametrize("decreasing", [False, True])
+def test_snip_2d_matches_root_loop(decreasing):
+    data = np.random.default_rng(0).poisson(50, (40, 33)).astype(float)
+    np.testing.assert_allclose(snip_2d(data, 6, decreasing), root_snip_2d(data, 6, decreasing), rtol = 1e-12)
+
+@pytest.mark.parametrize("workers", [1, 2])
+@pytest.mark.parametrize("decreasing", [False, True])
+def test_tiles_match_whole_matrix(tmp_path, workers, decreasing):
+    data = coincidence_matrix(150, 1)
+    expected = calculate_matrix_background(data, 5, decreasing)[1]
+    #Tiles of 40 elements do not divide the matrix, so the last tiles are smaller
+    background = estimate_matrix_background(data, str(tmp_path / "background.npy"), 5, decreasing, tileSize = 40, workers = workers)
+    np.testing.assert_array_equal(background, expected)
+    path = str(tmp_path / "matrix.npy")
+    np.save(path, data)
+    np.testing.assert_array_equal(estimate_matrix_background(path, str(tmp_path / "background.npy"), 5, decreasing, tileSize = 40, workers = workers), expected)
+
+def test_halo_as_large_as_matrix_warns(tmp_path):
+    with pytest.warns(RuntimeWarning):
+        estimate_matrix_background(coincidence_matrix(60, 2), str(tmp_path / "background.npy"), 6, tileSize = 30, workers = 1)
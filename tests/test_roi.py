@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+from spectra import synthetic_spectrum
+from nda.roi import roiIndex, roiTable
+
+#Regions inside the spectrum, touching its ends, clipped at both ends and empty
+bounds = [(100, 400), (0, 1), (0, 600), (599, 600), (-50, 20), (550, 900), (-10, 1000), (300, 300), (700, 800)]
+
+def expected_counts(data, low, high):
+    size = data.shape[-1]
+    low = min(max(low, 0), size)
+    return data[..., low: min(max(high, low), size)].sum(axis = -1)
+
+@pytest.mark.parametrize("low, high", bounds)
+def test_counts_match_sums(low, high):
+    data = synthetic_spectrum(600, 5, 0)
+    background = np.full(600, 40.0)
+    index = roiIndex(data, data - background)
+    raw, net = expected_counts(data, low, high), expected_counts(data - background, low, high)
+    assert index.counts(low, high) == pytest.approx(raw, abs = 1e-6)
+    assert index.counts(low, high, True) == pytest.approx(net, abs = 1e-6)
+    assert index.uncertainty(low, high) == pytest.approx(np.sqrt(raw))
+    #The background counts B = N - net enter the uncertainty of the counts without background
+    assert index.uncertainty(low, high, True) == pytest.approx(np.sqrt(raw + (raw - net)))
+
+def test_counts_of_many_spectra():
+    data = np.array([synthetic_spectrum(600, 3 + seed, seed) for seed in range(4)])
+    index = roiIndex(data, data / 2)
+    for low, high in bounds:
+        np.testing.assert_allclose(index.counts(low, high), expected_counts(data, low, high), atol = 1e-6)
+        np.testing.assert_allclose(index.counts(low, high, True), expected_counts(data / 2, low, high), atol = 1e-6)
+
+def test_update_resets_background():
+    data = np.arange(10.0)
+    index = roiIndex(data, data - 1)
+    assert index.hasBackground
+    index.update(data * 2)
+    assert not index.hasBackground and index.counts(0, 10) == 90
+    with pytest.raises(ValueError):
+        index.counts(0, 10, True)
+    with pytest.raises(ValueError):
+        roiIndex().counts(0, 10)
+
+def test_table_evaluate():
+    data = np.array([synthetic_spectrum(600, 3 + seed, seed) for seed in range(3)])
+    #Swapped bounds are put in order
+    table = roiTable([("A", 400, 100), ("B", -50, 20), ("C", 550, 900)])
+    assert list(table) == [("A", 100, 400), ("B", -50, 20), ("C", 550, 900)]
+    results = table.evaluate(roiIndex(data))
+    assert "counts_no_bkg" not in results
+    results = table.evaluate(roiIndex(data, data - 10))
+    assert results["names"] == ["A", "B", "C"] and results["counts"].shape == (3, 3)
+    for column, (_, low, high) in enumerate(table):
+        np.testing.assert_allclose(results["counts"][:, column], expected_counts(data, low, high), atol = 1e-6)
+        np.testing.assert_allclose(results["counts_no_bkg"][:, column], expected_counts(data - 10, low, high), atol = 1e-6)
+        np.testing.assert_allclose(results["countsError"][:, column], np.sqrt(expected_counts(data, low, high)))
+    single = table.evaluate(roiIndex(data[1], data[1] - 10))
+    np.testing.assert_allclose(single["counts_no_bkgError"], results["counts_no_bkgError"][1])
+    table.remove("B")
+    assert len(table) == 2
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+import reference_sasnip
+from spectra import synthetic_spectrum
+from nda import sasnip as sasnipModule
+from nda.diagnostics import backgroundDiagnostics
+from nda.sasnip import batchSasnip, sasnip, sasnipPipeline
+
+#Empty spectra divide by zero in the stop condition, in the reference as well
+pytestmark = pytest.mark.filterwarnings("ignore::RuntimeWarning")
+
+#Spectra of several sizes, peak densities and statistics, with the parameters of every branch of the clipping and of the peak search
+cases = []
+for seed in range(8):
+    for size in (50, 600, 2000):
+        parameters = {"decrease": bool(seed % 2), "smooth": seed % 3 != 0, "peakMaximum": [100, 30, 200][seed % 3], "derivativeThreshold": seed % 2, "t": 1 + seed % 2 if size < 2000 else 1}
+        cases.append((synthetic_spectrum(size, 3 + seed, seed, 10 ** (seed % 4)), parameters))
+cases += [(np.zeros(100), {}), (np.full(100, 5.0), {}), (np.arange(3.0), {}), (np.array([7.0]), {})]
+
+@pytest.fixture(scope = "module")
+def references():
+    return [reference_sasnip.sasnip(signal, **parameters) for signal, parameters in cases]
+
+@pytest.mark.parametrize("case", range(len(cases)))
+def test_sasnip_matches_reference(case, references):
+    signal, parameters = cases[case]
+    np.testing.assert_array_equal(sasnip(signal, **parameters), references[case])
+
+@pytest.mark.parametrize("case", range(len(cases)))
+def test_pipeline_matches_reference(case, references):
+    signal, parameters = cases[case]
+    pipeline = sasnipPipeline(signal)
+    #The second run reuses the stages of the first one
+    pipeline.run(**dict(parameters, tolerance = 0.05))
+    np.testing.assert_array_equal(pipeline.run(**parameters), references[case])
+
+@pytest.mark.parametrize("blockBytes", [sasnipModule.blockBytes, 1])
+def test_batch_matches_reference(blockBytes, monkeypatch):
+    #Rows of the same size with different statistics converge after different numbers of sweeps; the smallest blocks clip one row at a time
+    monkeypatch.setattr(sasnipModule, "blockBytes", blockBytes)
+    for size in (50, 600, 2000):
+        for parameters in ({}, {"decrease": False, "smooth": False, "peakMaximum": 30}):
+            signals = np.array([synthetic_spectrum(size, 3 + seed, seed, 10 ** (seed % 4)) for seed in range(6)] + [np.zeros(size)])
+            expected = np.array([reference_sasnip.sasnip(signal, **parameters) for signal in signals])
+            np.testing.assert_array_equal(batchSasnip(signals, **parameters), expected)
+
+def test_max_iterations_stops_after_the_budget():
+    signal = synthetic_spectrum(2000, 10, 3, 1000)
+    full = backgroundDiagnostics()
+    expected = sasnip(signal, diagnostics = full)
+    assert full.iterations[0] > 2
+    record = backgroundDiagnostics()
+    background = sasnip(signal, maxIterations = 2, diagnostics = record)
+    assert record.iterations[0] == 2 and record.stopReason[0] == "maxIterations"
+    #Stopping earlier leaves the background above the converged one
+    assert (background >= expected).all() and background.sum() > expected.sum()
+    np.testing.assert_array_equal(sasnip(signal, maxIterations = full.iterations[0]), expected)
+    with pytest.raises(ValueError):
+        sasnip(signal, maxIterations = 0)
+
+def test_unchanged_sweep_stops_unreachable_tolerance():
+    #A negative tolerance is never met; the clipping stops once a sweep leaves the spectrum unchanged
+    record = backgroundDiagnostics()
+    sasnip(synthetic_spectrum(600, 5, 1, 100), tolerance = -1, diagnostics = record)
+    assert record.stopReason[0] == "unchanged"
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+from spectra import synthetic_spectrum
+from nda.background import calculate_snip_background
+from nda.sasnip import sasnip
+from nda.store import spectrumStore, estimate_store_backgrounds
+
+def test_create_append_reopen(tmp_path):
+    path = str(tmp_path / "spectra.store")
+    with spectrumStore.create(path, 4, 2) as store:
+        assert store.shape == (2, 4) and not store[:].any()
+        store[1] = np.arange(4.0)
+        store.append(np.full(4, 7.0))
+        store.append(np.ones((3, 4)))
+        assert store.shape == (6, 4)
+    with spectrumStore(path) as store:
+        assert store.shape == (6, 4) and store.dtype == np.float64
+        np.testing.assert_array_equal(store[1], np.arange(4.0))
+        np.testing.assert_array_equal(store[2], np.full(4, 7.0))
+        np.testing.assert_array_equal(store[3:], np.ones((3, 4)))
+        with pytest.raises(ValueError):
+            store.append(np.ones(4))
+
+def test_append_wrong_channels(tmp_path):
+    with spectrumStore.create(str(tmp_path / "spectra.store"), 4) as store:
+        #A spectrum of the wrong length is not split into several rows
+        with pytest.raises(ValueError):
+            store.append(np.arange(8.0))
+        with pytest.raises(ValueError):
+            store.append(np.ones((2, 3)))
+        assert store.shape == (0, 4)
+
+def test_not_a_store(tmp_path):
+    path = tmp_path / "spectrum.txt"
+    path.write_text("1\n2\n")
+    with pytest.raises(ValueError):
+        spectrumStore(str(path))
+
+def test_chunks(tmp_path):
+    data = np.arange(7 * 3.0).reshape(7, 3)
+    with spectrumStore.create(str(tmp_path / "spectra.store"), 3) as store:
+        store.append(data)
+        chunks = list(store.chunks(3))
+        assert [start for start, _ in chunks] == [0, 3, 6]
+        np.testing.assert_array_equal(np.concatenate([rows for _, rows in chunks]), data)
+
+@pytest.mark.parametrize("method, parameters", [("sasnip", {}), ("sasnip", {"decrease": False, "peakMaximum": 30}), ("snip", {"mhw": 10, "shw": 1})])
+def test_estimate_store_backgrounds_matches_loop(tmp_path, method, parameters):
+    if method == "snip":
+        pytest.importorskip("pybaselines")
+    data = np.array([synthetic_spectrum(600, 3 + seed, seed, 10 ** (seed % 4)) for seed in range(7)])
+    with spectrumStore.create(str(tmp_path / "spectra.store"), 600) as store:
+        store.append(data)
+        #Chunks of 3 spectra leave a shorter last chunk
+        with estimate_store_backgrounds(store, str(tmp_path / "backgrounds.store"), method, parameters, chunkSize = 3) as backgrounds:
+            expected = [sasnip(spectrum, **parameters) if method == "sasnip" else calculate_snip_background(spectrum, **parameters)[1] for spectrum in data]
+            np.testing.assert_array_equal(backgrounds[:], np.array(expected))
@@ -0,0 +1,9 @@
+from spectra import synthetic_spectrum
+from nda.sweep import parameter_grid, sweep
+
+def test_pool_matches_single_process():
+    data = synthetic_spectrum(2000, 8, 0)
+    parameterSets = parameter_grid({"peakMaximum": [50, 100], "derivativeThreshold": [0, 2]})
+    single = sweep(data, "sasnip", parameterSets, workers = 1)
+    pooled = sweep(data, "sasnip", parameterSets, workers = 2)
+    assert pooled == single